@@ -1,28 +1,119 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from test import is_plastic_garbage
-from video import analyze_garbage_disposal
-from fastapi import File, UploadFile, HTTPException
-from pydantic import BaseModel
-import base64
-from typing import Optional
-import io
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Optional, List
+import asyncio
+import json
+import math
 import os
 import logging
-from modules.ocr import extract_aadhar_number
-from modules.aadhar_processor import AadharCardProcessor
-from modules.barcode_scanner import BarcodeScanner
-
-# Initialize processors
-aadhar_processor = AadharCardProcessor()
-barcode_scanner = BarcodeScanner()
-os.environ['GROQ_API_KEY'] = ''
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+from groq import RateLimitError
+from modules.groq_scheduler import QueueTimeoutError
+from modules.groq_client import UNAVAILABLE_ERRORS, close_groq_client, prewarm_groq_client, retry_after
+from modules.cpu_pool import cpu_pool, video_pool
+from modules.processor_registry import ProcessorRegistry
+from modules.image_utils import ImageInput
+from modules.result_cache import result_cache, prompt_version
+from modules.single_flight import single_flight
+from modules.model_router import model_router
+from modules.job_queue import JobStore, JobWorkerPool, QueueFullError
+from modules.metrics import (
+    BOOT_SECONDS, IN_FLIGHT, PAYLOAD_BYTES, REQUEST_SECONDS, REQUESTS,
+    ResultCacheCollector, record_error, remove_private_metrics_dir, render_metrics,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-app = FastAPI()
+
+# Processors pull in OpenCV, tesseract, PIL etc., so they are loaded on first use
+def _load_detector():
+    import test as plastic_detector
+    return plastic_detector
+
+def _load_aadhar_processor():
+    from modules.aadhar_processor import AadharCardProcessor
+    return AadharCardProcessor()
+
+def _load_barcode_scanner():
+    from modules.barcode_scanner import BarcodeScanner
+    return BarcodeScanner()
+
+def _load_document_scanner():
+    from modules.document_scanner import DocumentScanner
+    return DocumentScanner(processors.get("aadhar"), processors.get("barcode"), processors.get("detect"))
+
+def _load_video_analysis():
+    import video
+    return video
+
+processors = ProcessorRegistry()
+processors.register("detect", _load_detector)
+processors.register("aadhar", _load_aadhar_processor)
+processors.register("barcode", _load_barcode_scanner)
+processors.register("scan", _load_document_scanner)
+processors.register("analyze", _load_video_analysis)
+
+# Modules imported by the CPU pool tasks, loaded into the pool processes at boot
+CPU_POOL_MODULES = (
+    "modules.aadhar_processor", "modules.barcode_scanner", "modules.detect_backends", "modules.document_scanner",
+)
+VIDEO_POOL_MODULES = ("video",)
+CPU_POOL_PREWARM = os.getenv("CPU_POOL_PREWARM", "1") == "1"
+
+# gunicorn.conf.py sets this in preload mode, so the master loads everything
+# once and the workers inherit it
+PRELOADED = os.getenv("PRELOAD_PROCESSORS") == "1"
+if PRELOADED:
+    processors.load_all()
+
+async def _analyze_video(video_url):
+    return await processors.get("analyze").run_garbage_analysis(video_url)
+
+job_store = JobStore()
+job_pool = JobWorkerPool(
+    job_store, _analyze_video, retry_on=UNAVAILABLE_ERRORS + (BrokenProcessPool,), retry_after=retry_after
+)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+logger.info(f"Imported app in {IMPORT_SECONDS:.3f}s (pid {os.getpid()}, preloaded={PRELOADED})")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Open model-API connections and start the process pools before reporting ready
+    warmups = [prewarm_groq_client()]
+    if CPU_POOL_PREWARM:
+        warmups.append(cpu_pool.warm(CPU_POOL_MODULES))
+        warmups.append(video_pool.warm(VIDEO_POOL_MODULES))
+    warmed = await asyncio.gather(*warmups)
+    job_pool.start()
+
+    startup_seconds = time.perf_counter() - started
+    BOOT_SECONDS.labels("import").set(IMPORT_SECONDS)
+    BOOT_SECONDS.labels("processors").set(sum(processors.load_seconds().values()))
+    BOOT_SECONDS.labels("startup").set(startup_seconds)
+    logger.info(
+        f"Worker {os.getpid()} ready in {startup_seconds:.3f}s: "
+        f"{warmed[0]} Groq connection(s) warmed, "
+        f"{warmed[1] if CPU_POOL_PREWARM else 0} CPU and {warmed[2] if CPU_POOL_PREWARM else 0} video pool process(es) started, "
+        f"processors loaded: {processors.load_seconds()}"
+    )
+    yield
+    await job_pool.stop()
+    # Release the pooled Groq connections held by this worker
+    await close_groq_client()
+    cpu_pool.shutdown()
+    video_pool.shutdown()
+    remove_private_metrics_dir()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -33,71 +124,402 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        # Label by route template so /analyze/{job_id} stays one series
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(endpoint, request.method, str(status)).inc()
+
 class ImageRequest(BaseModel):
     image: str
 
-@app.post("/detect")
-async def detect_plastic(image_request: ImageRequest):
+# Form fields that may carry the uploaded image in multipart requests
+IMAGE_FORM_FIELDS = ("image", "file")
+
+# Image endpoints accept JSON (base64 or URL), multipart uploads and raw bytes
+IMAGE_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": ImageRequest.model_json_schema()},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"image": {"type": "string", "format": "binary"}},
+                    "required": ["image"],
+                }
+            },
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+IMAGE_BATCH_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": TypeAdapter(List[ImageRequest]).json_schema()},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "image": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                    },
+                    "required": ["image"],
+                }
+            },
+        },
+    }
+}
+
+def _content_type(request):
+    return request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+async def _form_image(value):
+    # Uploaded files arrive as bytes, plain form fields as URL/base64 text
+    if isinstance(value, str):
+        return ImageInput.from_string(value)
+    return ImageInput.from_bytes(await value.read())
+
+def _observe_payload(request, images):
+    for image in images:
+        PAYLOAD_BYTES.labels(request.url.path).observe(image.size)
+    return images
+
+async def read_image(request: Request) -> ImageInput:
+    """Read one image from a JSON, multipart or raw-bytes request body."""
+    content_type = _content_type(request)
+    if content_type == "multipart/form-data":
+        form = await request.form()
+        for field in IMAGE_FORM_FIELDS:
+            if field in form:
+                return _observe_payload(request, [await _form_image(form[field])])[0]
+        raise HTTPException(status_code=400, detail="No image data provided")
+
+    if content_type == "application/octet-stream" or content_type.startswith("image/"):
+        return _observe_payload(request, [ImageInput.from_bytes(await request.body())])[0]
+
+    try:
+        image_request = ImageRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    return _observe_payload(request, [ImageInput.from_string(image_request.image)])[0]
+
+async def read_images(request: Request) -> List[ImageInput]:
+    """Read a list of images from a JSON array or repeated multipart fields."""
+    if _content_type(request) == "multipart/form-data":
+        form = await request.form()
+        values = [value for field in IMAGE_FORM_FIELDS for value in form.getlist(field)]
+        return _observe_payload(request, [await _form_image(value) for value in values])
+
+    try:
+        image_requests = TypeAdapter(List[ImageRequest]).validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    return _observe_payload(request, [ImageInput.from_string(item.image) for item in image_requests])
+
+# Per-batch fan-out limits
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50"))
+
+# Cache versions change whenever the model or prompt behind an endpoint changes
+def detect_cache_version():
+    detector = processors.get("detect")
+    return prompt_version(detector.detect_backends.version(), detector.PROMPT)
+
+def aadhar_cache_version():
+    processor = processors.get("aadhar")
+    return prompt_version(model_router.version("aadhar"), processor.PROMPT, processor.PIPELINE_VERSION)
+
+def barcode_cache_version():
+    scanner = processors.get("barcode")
+    return prompt_version(model_router.version("barcode"), scanner.PROMPT, scanner.PIPELINE_VERSION)
+
+def scan_cache_version(tasks):
+    return prompt_version(processors.get("scan").version(tasks))
+
+def http_error(error):
+    """HTTP error for a failed request: 429/503 when the model API or a process pool is the cause, else 400."""
+    if isinstance(error, (RateLimitError, QueueTimeoutError)):
+        seconds = retry_after(error)
+        headers = {"Retry-After": str(max(1, math.ceil(seconds)))} if seconds else None
+        return HTTPException(status_code=429, detail="Model API rate limit reached, retry later", headers=headers)
+    if isinstance(error, UNAVAILABLE_ERRORS):
+        seconds = retry_after(error)
+        headers = {"Retry-After": str(max(1, math.ceil(seconds)))} if seconds else None
+        return HTTPException(status_code=503, detail="Model API unavailable, retry later", headers=headers)
+    if isinstance(error, BrokenProcessPool):
+        # Restarted by CPUPool.run, the next attempt gets fresh processes
+        return HTTPException(status_code=503, detail="Image processing pool restarting, retry later")
+    return HTTPException(status_code=400, detail=str(error))
+
+async def cached_result(endpoint, image, version, compute, should_cache=None):
+    """Serve a result from the shared cache, computing and storing it on a miss.
+
+    Concurrent misses for the same image share a single computation.
+    """
+    image_bytes = image.raw
+    if not image_bytes:
+        # URLs (and undecodable payloads) are not content addressable
+        return await compute()
+
+    # Hashing a large upload and the SQLite round trips stay off the event loop
+    key = await asyncio.to_thread(result_cache.make_key, endpoint, image_bytes, version)
+    cached = await asyncio.to_thread(result_cache.get, endpoint, key)
+    if cached is not None:
+        logger.info(f"Cache hit for {endpoint}")
+        return cached
+
+    async def compute_and_store():
+        result = await compute()
+        if should_cache is None or should_cache(result):
+            await asyncio.to_thread(result_cache.set, endpoint, key, result)
+        return result
+
+    return await single_flight.run(endpoint, key, compute_and_store)
+
+async def _detect(image):
+    result = await processors.get("detect").is_plastic_garbage(image)
+    return {"plastic_garbage": "YES" if result else "NO"}
+
+async def _aadhar(image):
+    number = await processors.get("aadhar").extract_aadhar_number(image)
+    return {"aadhar_number": number}
+
+async def _barcode(image):
+    return await processors.get("barcode").scan_barcode(image)
+
+def _is_valid_aadhar_result(response):
+    # Only successful extractions are cached, fallbacks may recover on retry
+    number = response.get("aadhar_number")
+    return bool(number) and number.isdigit() and len(number) == 12
+
+async def detect_image(image):
+    return await cached_result(
+        "detect", image, detect_cache_version(),
+        lambda: _detect(image)
+    )
+
+async def aadhar_image(image):
+    return await cached_result(
+        "aadhar", image, aadhar_cache_version(),
+        lambda: _aadhar(image),
+        should_cache=_is_valid_aadhar_result
+    )
+
+async def barcode_image(image):
+    return await cached_result(
+        "barcode", image, barcode_cache_version(),
+        lambda: _barcode(image)
+    )
+
+async def scan_image(image, tasks):
+    def should_cache(response):
+        return "aadhar" not in response or _is_valid_aadhar_result(response["aadhar"])
+
+    return await cached_result(
+        "scan", image, scan_cache_version(tasks),
+        lambda: processors.get("scan").scan(image, tasks),
+        should_cache=should_cache
+    )
+
+async def run_batch(endpoint, items, process):
+    """Process batch items concurrently, returning per-item results in input order."""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {MAX_BATCH_SIZE} items")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_item(index, item):
+        async with semaphore:
+            try:
+                if item.is_empty:
+                    raise ValueError("No image data provided")
+                return {"index": index, "result": await process(item)}
+            except Exception as e:
+                logger.error(f"Error processing batch item {index}: {str(e)}", exc_info=True)
+                record_error(endpoint, e)
+                error = http_error(e)
+                return {"index": index, "error": error.detail, "status": error.status_code}
+
+    results = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+    return {"results": results}
+
+@app.post("/detect", openapi_extra=IMAGE_REQUEST_BODY)
+async def detect_plastic(image: ImageInput = Depends(read_image)):
     try:
         logger.info("Received request")
-        logger.info(f"Image data length: {len(image_request.image)}")
-        logger.info(f"Image data preview: {image_request.image[:50]}...")
+        logger.info(f"Image payload: {image}")
         
-        if not image_request.image:
+        if image.is_empty:
             raise HTTPException(status_code=400, detail="No image data provided")
-            
-        # Log the first few characters of the image data to verify format
-        logger.info(f"Image data preview: {image_request.image[:50]}...")
         
-        result = is_plastic_garbage(image_request.image)
-        logger.info(f"Processing complete. Result: {result}")
+        response = await detect_image(image)
+        logger.info(f"Processing complete. Result: {response}")
         
-        return {"plastic_garbage": "YES" if result else "NO"}
+        return response
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=400, detail=str(e))
+        record_error("detect", e)
+        raise http_error(e)
 
-@app.post("/analyze")
-async def video_analysis(video_url: str):
+@app.post("/analyze", status_code=202)
+async def video_analysis(video_url: str, callback_url: Optional[str] = None):
     try:
-        result = analyze_garbage_disposal(video_url)
-        return {"result": result}
+        job_id = await asyncio.to_thread(job_store.submit, video_url, callback_url)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    job_pool.notify()
+    logger.info(f"Queued analysis job {job_id}")
+    return {"job_id": job_id, "status": "queued", "status_url": f"/analyze/{job_id}"}
 
-@app.post("/aadhar")
-async def get_aadhar_number(image_request: ImageRequest):
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _analysis_events(video_url):
+    # The first event goes out before any work starts, so the client sees bytes at once
+    yield _sse("accepted", {"video_url": video_url})
+    try:
+        async for event, data in processors.get("analyze").stream_garbage_analysis(video_url):
+            yield _sse(event, data)
+    except Exception as e:
+        # The 200 has been sent already, errors can only be reported in the stream
+        logger.error(f"Error streaming analysis: {str(e)}", exc_info=True)
+        record_error("analyze_stream", e)
+        error = http_error(e)
+        data = {"error": error.detail, "status": error.status_code}
+        if error.headers:
+            data["retry_after"] = int(error.headers["Retry-After"])
+        yield _sse("error", data)
+
+# Streams run outside the job queue, so each worker caps how many it serves at once
+ANALYZE_STREAM_MAX_CONCURRENT = int(os.getenv("ANALYZE_STREAM_MAX_CONCURRENT", "4"))
+ANALYZE_STREAM_RETRY_AFTER = int(os.getenv("ANALYZE_STREAM_RETRY_AFTER", "5"))
+stream_slots = asyncio.Semaphore(ANALYZE_STREAM_MAX_CONCURRENT)
+
+class AnalysisStreamResponse(StreamingResponse):
+    """Event stream that frees its slot however the response ends, even if the body never starts."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            stream_slots.release()
+
+# Declared before /analyze/{job_id}, which would otherwise take "stream" as a job id
+@app.get("/analyze/stream")
+async def video_analysis_stream(video_url: str):
+    """Analyse a video while the client waits, reporting progress as server-sent events."""
+    if stream_slots.locked():
+        raise HTTPException(
+            status_code=429,
+            detail="Too many analysis streams, retry later or use POST /analyze",
+            headers={"Retry-After": str(ANALYZE_STREAM_RETRY_AFTER)},
+        )
+    # Not locked, so this returns without waiting
+    await stream_slots.acquire()
+    return AnalysisStreamResponse(
+        _analysis_events(video_url),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/analyze/{job_id}")
+async def video_analysis_status(job_id: str):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/aadhar", openapi_extra=IMAGE_REQUEST_BODY)
+async def get_aadhar_number(image: ImageInput = Depends(read_image)):
     try:
         logger.info("Received Aadhar card processing request")
         
-        if not image_request.image:
+        if image.is_empty:
             raise HTTPException(status_code=400, detail="No image data provided")
         
-        number = aadhar_processor.extract_aadhar_number(image_request.image)
-        logger.info(f"Processing complete. Result: {number}")
+        response = await aadhar_image(image)
+        logger.info(f"Processing complete. Result: {response}")
         
-        return {"aadhar_number": number}
+        return response
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=400, detail=str(e))
+        record_error("aadhar", e)
+        raise http_error(e)
+
+@app.post("/scan", openapi_extra=IMAGE_REQUEST_BODY)
+async def scan_document(image: ImageInput = Depends(read_image), tasks: str = "aadhar,barcode,detect"):
+    """Run several of aadhar, barcode and detect on one image with at most one model call."""
+    try:
+        logger.info(f"Received scan request for {tasks}")
+        
+        if image.is_empty:
+            raise HTTPException(status_code=400, detail="No image data provided")
+        
+        response = await scan_image(image, processors.get("scan").parse_tasks(tasks))
+        logger.info(f"Processing complete. Result: {response}")
+        
+        return response
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        record_error("scan", e)
+        raise http_error(e)
 
 # Add new barcode endpoint
-@app.post("/barcode")
-async def scan_barcode(image_request: ImageRequest):
+@app.post("/barcode", openapi_extra=IMAGE_REQUEST_BODY)
+async def scan_barcode(image: ImageInput = Depends(read_image)):
     try:
         logger.info("Received barcode scanning request")
         
-        if not image_request.image:
+        if image.is_empty:
             raise HTTPException(status_code=400, detail="No image data provided")
         
-        result = barcode_scanner.scan_barcode(image_request.image)
-        logger.info(f"Processing complete. Result: {result}")
+        response = await barcode_image(image)
+        logger.info(f"Processing complete. Result: {response}")
         
-        return {"barcode_value": result}
+        return response
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=400, detail=str(e))
+        record_error("barcode", e)
+        raise http_error(e)
+
+@app.post("/detect/batch", openapi_extra=IMAGE_BATCH_REQUEST_BODY)
+async def detect_plastic_batch(images: List[ImageInput] = Depends(read_images)):
+    return await run_batch("detect", images, detect_image)
+
+@app.post("/aadhar/batch", openapi_extra=IMAGE_BATCH_REQUEST_BODY)
+async def get_aadhar_number_batch(images: List[ImageInput] = Depends(read_images)):
+    return await run_batch("aadhar", images, aadhar_image)
+
+@app.post("/barcode/batch", openapi_extra=IMAGE_BATCH_REQUEST_BODY)
+async def scan_barcode_batch(images: List[ImageInput] = Depends(read_images)):
+    return await run_batch("barcode", images, barcode_image)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the shared result cache (aggregated over all workers)."""
+    return await asyncio.to_thread(result_cache.stats)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics, aggregated over all gunicorn workers."""
+    body, content_type = await asyncio.to_thread(render_metrics, [ResultCacheCollector(result_cache)])
+    return Response(content=body, media_type=content_type)
 
 
 if __name__ == "__main__":
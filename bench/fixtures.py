@@ -0,0 +1,142 @@
+"""Synthetic request payloads and a local video server for the benchmarks."""
+import os
+import re
+import base64
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+VIDEO_NAME = "disposal.mp4"
+
+# EAN-13 digit encodings (L/G/R sets) and the first-digit parity table
+EAN_L = ["0001101", "0011001", "0010011", "0111101", "0100011", "0110001", "0101111", "0111011", "0110111", "0001011"]
+EAN_G = ["0100111", "0110011", "0011011", "0100001", "0011101", "0111001", "0000101", "0010001", "0001001", "0010111"]
+EAN_R = ["1110010", "1100110", "1101100", "1000010", "1011100", "1001110", "1010000", "1000100", "1001000", "1110100"]
+EAN_PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def _encode(image, extension='.jpg'):
+    return cv2.imencode(extension, image)[1].tobytes()
+
+
+def scene_image(width=1920, height=1440, seed=0):
+    """A photo-like scene: smooth background with a few coloured blobs."""
+    rng = np.random.default_rng(seed)
+    image = cv2.resize(rng.integers(0, 255, (12, 16, 3), dtype=np.uint8), (width, height), interpolation=cv2.INTER_CUBIC)
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.ellipse(image, center, (int(rng.integers(40, 300)), int(rng.integers(40, 200))), 0, 0, 360, color, -1)
+    noise = rng.normal(0, 6, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def aadhar_card_image(number="2345 6789 0124", width=1600, height=1000):
+    """A synthetic Aadhar-style card with the number on its own line."""
+    image = np.full((height, width, 3), (235, 240, 245), np.uint8)
+    cv2.rectangle(image, (0, 0), (width, 120), (40, 120, 230), -1)
+    cv2.putText(image, "GOVERNMENT OF INDIA", (400, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (255, 255, 255), 4)
+    cv2.rectangle(image, (80, 200), (420, 620), (150, 150, 150), -1)
+    for i, line in enumerate(["Name: Test Person", "DOB: 01/01/1990", "Gender: MALE"]):
+        cv2.putText(image, line, (500, 280 + i * 90), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 3)
+    cv2.putText(image, number, (460, 800), cv2.FONT_HERSHEY_SIMPLEX, 2.6, (10, 10, 10), 6)
+    noise = np.random.default_rng(1).normal(0, 8, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def ean13_image(code="4006381333931", module_width=3, bar_height=160):
+    """Render an EAN-13 barcode with a generous quiet zone."""
+    digits = [int(c) for c in code]
+    parity = EAN_PARITY[digits[0]]
+    left = "".join((EAN_L if parity[i] == "L" else EAN_G)[digits[i + 1]] for i in range(6))
+    right = "".join(EAN_R[d] for d in digits[7:])
+    pattern = "101" + left + "01010" + right + "101"
+    row = np.array([0 if bit == "1" else 255 for bit in pattern], np.uint8)
+    bars = np.repeat(np.repeat(row[None, :], bar_height, 0), module_width, 1)
+    bars = cv2.copyMakeBorder(bars, 200, 200, 300, 300, cv2.BORDER_CONSTANT, value=255)
+    return cv2.cvtColor(bars, cv2.COLOR_GRAY2BGR)
+
+
+def write_video(path, seconds=20, fps=25, size=(640, 480)):
+    """Write an MP4 with a moving object so frames differ over time."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    background = scene_image(*size, seed=3)
+    for index in range(seconds * fps):
+        frame = background.copy()
+        x = int((index / (seconds * fps)) * (size[0] - 120))
+        cv2.rectangle(frame, (x, 200), (x + 120, 320), (30, 200, 30), -1)
+        cv2.putText(frame, str(index), (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+
+def build_payloads():
+    """Base64 JSON payloads for each image endpoint."""
+    as_b64 = lambda data: base64.b64encode(data).decode("utf-8")
+    return {
+        "detect": {"image": as_b64(_encode(scene_image()))},
+        "aadhar": {"image": as_b64(_encode(aadhar_card_image()))},
+        "barcode": {"image": as_b64(_encode(ean13_image(), '.png'))},
+    }
+
+
+def ensure_video():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, VIDEO_NAME)
+    if not os.path.exists(path):
+        write_video(path)
+    return path
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with single-range support, like a CDN."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        path = self.translate_path(self.path.split("?")[0])
+        if not range_header or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        handle = open(path, "rb")
+        handle.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self._remaining = end - start + 1
+        return handle
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        try:
+            while remaining > 0:
+                chunk = source.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                outputfile.write(chunk)
+                remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve_fixtures(port):
+    """Serve the fixture directory on a background thread, return the server."""
+    ensure_video()
+    handler = partial(RangeRequestHandler, directory=FIXTURE_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,174 @@
+"""Local stand-in for the Groq chat-completions API.
+
+Serves ``POST /openai/v1/chat/completions`` with canned answers so the
+service can be load tested without spending API quota. Point the app at it
+with ``GROQ_BASE_URL=http://127.0.0.1:<port>``.
+
+Behaviour is configured through environment variables:
+
+    MOCK_GROQ_LATENCY_MS   mean response latency, time to first chunk when streaming (default 800)
+    MOCK_GROQ_TOKEN_MS     delay between streamed chunks (default 30)
+    MOCK_GROQ_JITTER_MS    +/- uniform jitter around the mean (default 200)
+    MOCK_GROQ_ERROR_RATE   fraction of requests that fail (default 0)
+    MOCK_GROQ_ERROR_STATUS status code used for injected errors (default 500)
+    MOCK_GROQ_RPM          requests per minute before answering 429 (default 0, no limit)
+    MOCK_GROQ_TPM          tokens per minute reported in the rate-limit headers (default 6000)
+"""
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("MOCK_GROQ_LATENCY_MS", "800"))
+JITTER_MS = float(os.getenv("MOCK_GROQ_JITTER_MS", "200"))
+TOKEN_MS = float(os.getenv("MOCK_GROQ_TOKEN_MS", "30"))
+ERROR_RATE = float(os.getenv("MOCK_GROQ_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("MOCK_GROQ_ERROR_STATUS", "500"))
+RPM = int(os.getenv("MOCK_GROQ_RPM", "0"))
+TPM = int(os.getenv("MOCK_GROQ_TPM", "6000"))
+
+app = FastAPI()
+stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+# Fixed one-minute window for the simulated request limit
+window = {"start": 0.0, "requests": 0}
+
+
+def _rate_limit_headers(retry_after=None):
+    """Headers shaped like Groq's; tokens are reported as untouched."""
+    reset = window["start"] + 60.0 - time.time()
+    headers = {
+        "x-ratelimit-limit-requests": str(RPM or 14400),
+        "x-ratelimit-remaining-requests": str(max(0, RPM - window["requests"]) if RPM else 14400),
+        "x-ratelimit-reset-requests": f"{max(0.0, reset):.2f}s",
+        "x-ratelimit-limit-tokens": str(TPM),
+        "x-ratelimit-remaining-tokens": str(TPM),
+        "x-ratelimit-reset-tokens": "0s",
+    }
+    if retry_after is not None:
+        headers["retry-after"] = str(retry_after)
+    return headers
+
+
+def _prompt_text(body):
+    """Concatenate the text parts of the chat messages."""
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(item.get("text", "") for item in content or [] if item.get("type") == "text")
+    return " ".join(parts).lower()
+
+
+def canned_answer(body):
+    """Pick a plausible answer for the prompt the service sent."""
+    prompt = _prompt_text(body)
+    if "json object" in prompt:
+        # Multi-task /scan prompt, answer each key it lists
+        answers = {
+            "aadhar": {"value": "2345 6789 0124", "confidence": 96},
+            "barcode": {"value": "4006381333931", "confidence": 95},
+            "detect": {"value": "YES", "confidence": 91},
+        }
+        return json.dumps({key: answer for key, answer in answers.items() if f'"{key}":' in prompt})
+    if "aadhar" in prompt:
+        return "2345 6789 0124 96%"
+    if "barcode" in prompt:
+        return "4006381333931 95%"
+    if "disposing" in prompt:
+        return "The frames show a person dropping a bag into a bin. Conclusion: YES, 87% confidence."
+    return "YES 91%"
+
+
+async def _stream_chunks(completion_id, model, answer):
+    """The answer as chat.completion.chunk server-sent events, a word at a time."""
+    def chunk(delta, finish_reason=None):
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for word in re.findall(r'\S+\s*', answer):
+        yield chunk({"content": word})
+        await asyncio.sleep(TOKEN_MS / 1000.0)
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    now = time.time()
+    if now - window["start"] >= 60.0:
+        window["start"], window["requests"] = now, 0
+    window["requests"] += 1
+    if RPM and window["requests"] > RPM:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            headers=_rate_limit_headers(retry_after=max(1, int(window["start"] + 60.0 - now))),
+        )
+
+    delay = max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000.0
+    await asyncio.sleep(delay)
+
+    if random.random() < ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"message": "Injected error", "type": "mock_error"}},
+        )
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream_chunks(completion_id, body.get("model"), canned_answer(body)),
+            media_type="text/event-stream",
+            headers=_rate_limit_headers(),
+        )
+
+    return JSONResponse(headers=_rate_limit_headers(), content={
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": canned_answer(body)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    })
+
+
+@app.get("/openai/v1/models")
+async def list_models():
+    # Hit by the connection pre-warm when a worker boots
+    return {
+        "object": "list",
+        "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "mock"}
+            for model in ("llama-3.2-11b-vision-preview", "llama-3.2-90b-vision-preview")
+        ],
+    }
+
+
+@app.get("/stats")
+async def mock_stats():
+    return stats
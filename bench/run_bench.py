@@ -0,0 +1,291 @@
+"""Load benchmark for the service against a local Groq stand-in.
+
+Starts the mock Groq API (bench/mock_groq.py), a fixture server for the
+video, and the real app under gunicorn with gunicorn.conf.py. Then each
+endpoint is driven with a fixed number of concurrent clients for a fixed
+duration. Latency percentiles, throughput and per-worker CPU/RSS are printed
+and saved to bench/results/ so runs can be compared across commits.
+
+    python bench/run_bench.py --duration 20 --concurrency 32
+    python bench/run_bench.py --compare bench/results/<previous>.json
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+import httpx
+import psutil
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures  # noqa: E402
+
+ENDPOINTS = ["detect", "aadhar", "barcode", "analyze"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def wait_for_http(url, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class ResourceSampler:
+    """Samples CPU% and RSS of every gunicorn worker and CPU pool process while the load runs."""
+
+    def __init__(self, master_pid, interval=0.5):
+        self.master = psutil.Process(master_pid)
+        self.interval = interval
+        self.samples = {}
+        self._task = None
+
+    async def _run(self):
+        while True:
+            for worker in self.master.children(recursive=True):
+                try:
+                    cpu = worker.cpu_percent(interval=None)
+                    rss = worker.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+                self.samples.setdefault(worker.pid, []).append((cpu, rss))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.samples = {}
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        workers = {}
+        for pid, samples in self.samples.items():
+            # The first cpu_percent() reading of a process is always 0
+            cpu = [c for c, _ in samples[1:]] or [0.0]
+            workers[str(pid)] = {
+                "cpu_percent_avg": round(sum(cpu) / len(cpu), 1),
+                "rss_mb_max": round(max(r for _, r in samples) / 2**20, 1),
+            }
+        return workers
+
+
+async def drive_image_endpoint(client, endpoint, payload, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/{endpoint}", json=payload)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def drive_analyze(client, video_url, concurrency, duration, job_timeout=120.0):
+    """Submit jobs and poll them to completion, timing submit and end-to-end."""
+    submit_latencies, complete_latencies, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/analyze", params={"video_url": video_url})
+                response.raise_for_status()
+                submit_latencies.append(time.perf_counter() - started)
+                status_url = response.json()["status_url"]
+                while time.perf_counter() - started < job_timeout:
+                    job = (await client.get(status_url)).json()
+                    if job["status"] in ("done", "failed"):
+                        break
+                    await asyncio.sleep(0.1)
+                if job["status"] != "done":
+                    errors += 1
+                    continue
+                complete_latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = summarize(complete_latencies, errors, elapsed)
+    result["submit_p50_ms"] = _ms(percentile(submit_latencies, 0.50))
+    result["submit_p99_ms"] = _ms(percentile(submit_latencies, 0.99))
+    return result
+
+
+async def run_load(args, master_pid, video_url):
+    payloads = fixtures.build_payloads()
+    sampler = ResourceSampler(master_pid)
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.app_url, timeout=300.0, limits=limits) as client:
+        for endpoint in args.endpoints:
+            clients = args.analyze_concurrency if endpoint == "analyze" else args.concurrency
+            print(f"Driving /{endpoint} with {clients} clients for {args.duration}s...")
+            sampler.start()
+            if endpoint == "analyze":
+                result = await drive_analyze(client, video_url, args.analyze_concurrency, args.duration)
+            else:
+                result = await drive_image_endpoint(
+                    client, endpoint, payloads[endpoint], args.concurrency, args.duration
+                )
+            result["workers"] = await sampler.stop()
+            results[endpoint] = result
+            print(f"  {json.dumps({k: v for k, v in result.items() if k != 'workers'})}")
+    return results
+
+
+def start_processes(args):
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{args.mock_port}",
+        "MOCK_GROQ_LATENCY_MS": str(args.mock_latency_ms),
+        "MOCK_GROQ_JITTER_MS": str(args.mock_jitter_ms),
+        "MOCK_GROQ_ERROR_RATE": str(args.mock_error_rate),
+    })
+    if not args.with_cache:
+        env["RESULT_CACHE_ENABLED"] = "0"
+        env["VIDEO_CACHE_ENABLED"] = "0"
+    if args.workers:
+        # Read by gunicorn.conf.py, which also uses it to size the CPU pools
+        env["WEB_WORKERS"] = str(args.workers)
+
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_groq:app", "--port", str(args.mock_port), "--log-level", "warning"],
+        cwd=BENCH_DIR, env=env,
+    )
+    gunicorn_cmd = [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+        "--bind", f"127.0.0.1:{args.app_port}", "app:app",
+    ]
+    app = subprocess.Popen(gunicorn_cmd, cwd=REPO_DIR, env=env)
+    return mock, app
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    print(f"\nComparison against {baseline['revision']} ({baseline_path}):")
+    for endpoint, result in current["results"].items():
+        before = baseline["results"].get(endpoint)
+        if not before:
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if result.get(key) is None or not before.get(key):
+                continue
+            change = (result[key] - before[key]) / before[key] * 100
+            cells.append(f"{key} {before[key]} -> {result[key]} ({change:+.1f}%)")
+        print(f"  /{endpoint}: " + ", ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--analyze-concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="override gunicorn worker count")
+    parser.add_argument("--app-port", type=int, default=18092)
+    parser.add_argument("--mock-port", type=int, default=18090)
+    parser.add_argument("--fixture-port", type=int, default=18091)
+    parser.add_argument("--mock-latency-ms", type=float, default=800)
+    parser.add_argument("--mock-jitter-ms", type=float, default=200)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--with-cache", action="store_true", help="keep the result and video caches enabled")
+    parser.add_argument("--compare", help="baseline results file to diff against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    args.app_url = f"http://127.0.0.1:{args.app_port}"
+
+    fixture_server = fixtures.serve_fixtures(args.fixture_port)
+    video_url = f"http://127.0.0.1:{args.fixture_port}/{fixtures.VIDEO_NAME}"
+    mock, app = start_processes(args)
+    try:
+        wait_for_http(f"http://127.0.0.1:{args.mock_port}/stats")
+        wait_for_http(f"{args.app_url}/docs")
+        results = asyncio.run(run_load(args, app.pid, video_url))
+    finally:
+        app.send_signal(signal.SIGTERM)
+        mock.send_signal(signal.SIGTERM)
+        app.wait(timeout=30)
+        mock.wait(timeout=30)
+        fixture_server.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("compare", "no_save", "app_url")
+        },
+        "results": results,
+    }
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{report['revision']}.json")
+        with open(path, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nSaved results to {path}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 # Gunicorn configuration file
+import os
+import shutil
+import tempfile
 import multiprocessing
 
+# Workers write Prometheus samples here so /metrics can aggregate them
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "check-octo-metrics")
+)
+
 max_requests = 1000
 max_requests_jitter = 50
 
@@ -8,5 +16,27 @@ log_file = "-"
 
 bind = "0.0.0.0:3100"
 
+# Import the app and every processor once in the master, so new workers
+# (including the ones recycled by max_requests) start from a forked, already
+# loaded copy. GUNICORN_PRELOAD=0 loads processors lazily in each worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+os.environ["PRELOAD_PROCESSORS"] = "1" if preload_app else "0"
+
 worker_class = "uvicorn.workers.UvicornWorker"
-workers = (multiprocessing.cpu_count() * 2) + 1
\ No newline at end of file
+# Workers mostly wait on Groq, a few event loops are enough. CPU-heavy stages
+# run in each worker's process pool (modules/cpu_pool.py), which splits the
+# cores between workers using WEB_WORKERS.
+workers = int(os.getenv("WEB_WORKERS", str(max(2, multiprocessing.cpu_count() // 4))))
+os.environ["WEB_WORKERS"] = str(workers)
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be summed into this one
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,39 +1,108 @@
 import cv2
 import numpy as np
-import base64
-from groq import Groq
-import pytesseract
+from modules.model_router import model_router, parse_confidence
+from modules.groq_client import UNAVAILABLE_ERRORS
+from modules.image_utils import ImageInput
+from modules.image_compaction import compact_for_model
+from modules.tesseract_ocr import TesseractOCR
+from modules.metrics import AADHAR_OCR, AADHAR_RESULTS, observe_stage
+from modules.cpu_pool import cpu_pool, read_shared_image
 import logging
 import os
-from PIL import Image
-import io
 import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Threads OCRing preprocessing variants side by side in each CPU pool process,
+# tesseract and OpenCV release the GIL while they work. 1 runs them in turn
+OCR_VARIANT_THREADS = int(os.getenv("AADHAR_OCR_THREADS", "2"))
+
+# Verhoeff check digit tables: multiplication in the dihedral group D5 and
+# the permutation applied at each position. Aadhar's last digit is one
+VERHOEFF_MULTIPLY = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+VERHOEFF_PERMUTE = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 7, 6, 8, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+
+# The number as printed on the card, three groups of four
+NUMBER_PATTERN = re.compile(r'(?<!\d)\d{4} ?\d{4} ?\d{4}(?!\d)')
+
+# A 12-digit number read by one OCR pass, with tesseract's confidence per digit
+Candidate = namedtuple('Candidate', ['number', 'confidences'])
+
+
+def verhoeff_valid(number):
+    """Whether a string of digits ends in a correct Verhoeff check digit"""
+    check = 0
+    for position, digit in enumerate(reversed(number)):
+        check = VERHOEFF_MULTIPLY[check][VERHOEFF_PERMUTE[position % 8][int(digit)]]
+    return check == 0
+
+
 class AadharCardProcessor:
+    PROMPT = (
+        "Extract and return only the 12-digit Aadhar number from this image, followed by a confidence percentage. "
+        "Return only the number and the percentage, no other text."
+    )
+    # Bump when the local pipeline or validation changes
+    PIPELINE_VERSION = "verhoeff-1"
+
+    # Localisation works on a downscaled copy of this width
+    LOCATE_WIDTH = 1000
+    # Number of candidate regions to OCR before giving up on local extraction
+    MAX_REGIONS = 3
+    # With the model unavailable OCR is the only chance, so look further
+    OCR_ONLY_MAX_REGIONS = 8
+    # Ways each region is preprocessed for OCR: (binarisation, digit height in
+    # pixels the crop is rescaled to, rotation in degrees). The first runs
+    # alone; the rest only when its read does not settle the number
+    OCR_VARIANTS = (
+        ("adaptive", 48, 0.0),
+        ("otsu", 48, 0.0),
+        ("gray", 48, 0.0),
+        ("adaptive", 32, 0.0),
+        ("otsu", 64, 0.0),
+        ("otsu", 48, -2.0),
+        ("otsu", 48, 2.0),
+    )
+    # Summed mean digit confidence a checksum-valid number needs: one clear
+    # read, or several weaker reads agreeing
+    MIN_VOTE_SUPPORT = 60.0
+    # Reads needed before digits are voted on position by position
+    MIN_FUSED_READS = 3
+
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        
-    def _decode_base64(self, base64_string):
-        """Decode base64 string to OpenCV image"""
-        try:
-            # Remove header if present
-            if 'base64,' in base64_string:
-                base64_string = base64_string.split('base64,')[1]
-            
-            img_bytes = base64.b64decode(base64_string)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            return image
-        except Exception as e:
-            logger.error(f"Error decoding base64 image: {str(e)}")
-            return None
+        self.ocr = TesseractOCR(psm=7)
+        self._variant_executor = None
+
+    def _preprocess_image(self, image, method="adaptive"):
+        """Preprocess image for better OCR results
 
-    def _preprocess_image(self, image):
-        """Preprocess image for better OCR results"""
+        ``method`` is the binarisation: "adaptive" thresholding, a global
+        "otsu" threshold, or "gray" to leave it to tesseract.
+        """
         try:
             # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -44,6 +113,11 @@ class AadharCardProcessor:
             # Apply CLAHE
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
             enhanced = clahe.apply(denoised)
+            if method == "gray":
+                return enhanced
+            if method == "otsu":
+                _, threshold = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                return threshold
             
             # Adaptive thresholding
             threshold = cv2.adaptiveThreshold(
@@ -57,22 +131,210 @@ class AadharCardProcessor:
             logger.error(f"Error in preprocessing: {str(e)}")
             return None
 
-    def _validate_aadhar_number(self, number):
-        """Validate the extracted Aadhar number"""
+    def _digit_group_score(self, binary):
+        """Score how closely a binarised line crop matches the 4-4-4 digit layout"""
+        count, _, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+        height = binary.shape[0]
+        # Keep blobs that are tall enough to be digits
+        glyphs = sorted(
+            (x, x + w) for x, y, w, h, area in stats[1:count]
+            if h >= 0.4 * height and w <= 1.2 * h
+        )
+        if len(glyphs) < 8:
+            return 0.0
+
+        gaps = np.array([glyphs[i + 1][0] - glyphs[i][1] for i in range(len(glyphs) - 1)])
+        # The two widest gaps should split the line into groups of four
+        split_at = np.sort(np.argsort(gaps)[-2:])
+        groups = [split_at[0] + 1, split_at[1] - split_at[0], len(glyphs) - split_at[1] - 1]
+        group_error = sum(abs(size - 4) for size in groups)
+        separation = np.min(gaps[split_at]) / (np.median(gaps) + 1.0)
+
+        score = 1.0 / (1.0 + group_error)
+        if separation > 1.5:
+            score += 0.5
+        return score
+
+    def _locate_number_regions(self, image, max_regions):
+        """Find the likely crops of the 12-digit number line, best first"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        scale = min(1.0, self.LOCATE_WIDTH / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        height, width = small.shape
+
+        # Highlight dark text on the light card and merge characters into lines
+        rect_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5))
+        blackhat = cv2.morphologyEx(small, cv2.MORPH_BLACKHAT, rect_kernel)
+        gradient = cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=-1)
+        gradient = cv2.convertScaleAbs(gradient)
+        line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 40), 3))
+        closed = cv2.morphologyEx(gradient, cv2.MORPH_CLOSE, line_kernel)
+        _, mask = cv2.threshold(closed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = cv2.erode(mask, None, iterations=1)
+        mask = cv2.dilate(mask, None, iterations=2)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        candidates = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            aspect = w / float(h)
+            if not (5.0 <= aspect <= 20.0):
+                continue
+            if not (0.015 * height <= h <= 0.15 * height and 0.15 * width <= w <= 0.9 * width):
+                continue
+
+            # Pad the box so the outer digits are not clipped
+            pad_x, pad_y = int(0.04 * w), int(0.25 * h)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+            crop = small[y0:y1, x0:x1]
+            _, binary = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            score = self._digit_group_score(binary)
+            if score > 0:
+                box = tuple(int(round(v / scale)) for v in (x0, y0, x1, y1))
+                candidates.append((score, box))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [box for _, box in candidates[:max_regions]]
+
+    def _rotate(self, crop, angle):
+        height, width = crop.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(crop, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def _candidates(self, symbols):
+        """12-digit numbers in OCR output, as Candidates"""
+        text = ''.join(character for character, _ in symbols)
+        spans = [match.span() for match in NUMBER_PATTERN.finditer(text)]
+        if not spans:
+            # The grouping was lost, take the digits if there are exactly twelve
+            spans = [(0, len(symbols))]
+
+        candidates = []
+        for start, end in spans:
+            digits = [(character, confidence) for character, confidence in symbols[start:end] if character.isdigit()]
+            if len(digits) == 12:
+                candidates.append(Candidate(
+                    ''.join(character for character, _ in digits),
+                    tuple(confidence for _, confidence in digits),
+                ))
+        return candidates
+
+    def _ocr_region(self, image, box, variant):
+        """Preprocess a candidate crop one way and OCR it into candidate numbers"""
+        method, digit_height, angle = variant
+        x0, y0, x1, y1 = box
+        crop = image[y0:y1, x0:x1]
+        factor = digit_height * 1.5 / crop.shape[0]
+        if abs(factor - 1.0) > 0.1:
+            interpolation = cv2.INTER_CUBIC if factor > 1 else cv2.INTER_AREA
+            crop = cv2.resize(crop, None, fx=factor, fy=factor, interpolation=interpolation)
+        if angle:
+            crop = self._rotate(crop, angle)
+
+        with observe_stage("preprocess"):
+            preprocessed = self._preprocess_image(crop, method)
+        if preprocessed is None:
+            return []
+        return self._candidates(self.ocr.image_to_symbols(preprocessed))
+
+    def _vote(self, candidates):
+        """Return the number the reads support, or None
+
+        Checksum-valid numbers are scored by the mean digit confidence of each
+        read that produced them. When no read is valid, enough reads are fused
+        digit by digit, weighted by confidence, since each may have misread a
+        different digit; the result must still pass the checksum.
+        """
+        support = {}
+        for candidate in candidates:
+            if self.validate_aadhar_number(candidate.number):
+                support[candidate.number] = support.get(candidate.number, 0.0) + float(np.mean(candidate.confidences))
+        if support:
+            number = max(support, key=support.get)
+            return number if support[number] >= self.MIN_VOTE_SUPPORT else None
+
+        if len(candidates) < self.MIN_FUSED_READS:
+            return None
+        fused = ''
+        for position in range(12):
+            weights = {}
+            for candidate in candidates:
+                digit = candidate.number[position]
+                weights[digit] = weights.get(digit, 0.0) + candidate.confidences[position]
+            fused += max(weights, key=weights.get)
+        return fused if self.validate_aadhar_number(fused) else None
+
+    def _map_variants(self, image, box, variants):
+        if OCR_VARIANT_THREADS <= 1:
+            return map(lambda variant: self._ocr_region(image, box, variant), variants)
+        if self._variant_executor is None:
+            # Each thread gets its own tesseract handle (see TesseractOCR)
+            self._variant_executor = ThreadPoolExecutor(OCR_VARIANT_THREADS, thread_name_prefix="aadhar-ocr")
+        return self._variant_executor.map(lambda variant: self._ocr_region(image, box, variant), variants)
+
+    def _extract_with_ocr(self, image, ocr_only=False):
+        """Run localisation and OCR, returning (valid number or None, outcome)
+
+        Each region is read with the first preprocessing variant and, unless
+        that settles it, with all the others, voting over every read. The
+        outcome says which step accepted the number. ``ocr_only`` is for when
+        there is no model fallback: more candidate regions are tried, then the
+        whole image.
+        """
+        with observe_stage("localize"):
+            regions = self._locate_number_regions(image, self.OCR_ONLY_MAX_REGIONS if ocr_only else self.MAX_REGIONS)
+        logger.info(f"Located {len(regions)} candidate number region(s)")
+
+        full_height, full_width = image.shape[:2]
+        if not regions:
+            # No line found (e.g. already cropped), OCR the whole image as before
+            regions = [(0, 0, full_width, full_height)]
+        elif ocr_only:
+            regions.append((0, 0, full_width, full_height))
+
+        primary, others = self.OCR_VARIANTS[0], self.OCR_VARIANTS[1:]
+        for box in regions:
+            candidates = self._ocr_region(image, box, primary)
+            aadhar_number = self._vote(candidates)
+            if aadhar_number:
+                return aadhar_number, "primary"
+
+            for found in self._map_variants(image, box, others):
+                candidates.extend(found)
+            aadhar_number = self._vote(candidates)
+            if aadhar_number:
+                logger.info(f"OCR ensemble agreed on a number from {len(candidates)} read(s)")
+                valid = any(candidate.number == aadhar_number for candidate in candidates)
+                return aadhar_number, "ensemble" if valid else "fused"
+        return None, None
+
+    def validate_aadhar_number(self, number):
+        """Validate the extracted Aadhar number: 12 digits, not starting with 0 or 1, Verhoeff check digit"""
         number = re.sub(r'\D', '', number)
-        return len(number) == 12
+        return len(number) == 12 and number[0] not in '01' and verhoeff_valid(number)
+
+    def _parse_model_answer(self, text):
+        """Return (number or None, confidence); an invalid number always escalates"""
+        answer, confidence = parse_confidence(text)
+        aadhar_number = ''.join(filter(str.isdigit, answer))
+        if self.validate_aadhar_number(aadhar_number):
+            return aadhar_number, confidence
+        return None, None
 
-    def _process_with_groq(self, image_content):
+    async def _process_with_groq(self, image_content):
         """Process image using Groq API"""
         try:
-            chat_completion = self.groq_client.chat.completions.create(
+            aadhar_number = await model_router.complete(
+                "aadhar",
+                self._parse_model_answer,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {
                                 "type": "text",
-                                "text": "Extract and return only the 12-digit Aadhar number from this image. Return only the number, no other text."
+                                "text": self.PROMPT
                             },
                             {
                                 "type": "image_url",
@@ -81,62 +343,92 @@ class AadharCardProcessor:
                         ]
                     }
                 ],
-                model="llama-3.2-90b-vision-preview",
                 temperature=0.0,
                 max_tokens=100
             )
 
-            aadhar_text = chat_completion.choices[0].message.content
-            aadhar_number = ''.join(filter(str.isdigit, aadhar_text))
-            
-            if self._validate_aadhar_number(aadhar_number):
+            if aadhar_number:
                 return aadhar_number
             return "Invalid Aadhar number detected"
+        except UNAVAILABLE_ERRORS:
+            # Rate limited or unavailable, not an unreadable card; let the caller retry
+            raise
         except Exception as e:
             logger.error(f"Error in Groq API processing: {str(e)}")
             return None
 
-    def extract_aadhar_number(self, image_data):
+    def ocr_result(self, aadhar_number, outcome, ocr_only):
+        """Count a local OCR result; returns the answer, or None when the model should be asked"""
+        if aadhar_number:
+            logger.info(f"Successfully extracted Aadhar number using OCR ({outcome})")
+            AADHAR_OCR.labels(outcome).inc()
+            AADHAR_RESULTS.labels("ocr_only" if ocr_only else "ocr").inc()
+            return aadhar_number
+        if ocr_only:
+            AADHAR_OCR.labels("failed").inc()
+            AADHAR_RESULTS.labels("none").inc()
+            return "No valid Aadhar number detected"
+        AADHAR_OCR.labels("fallback").inc()
+        return None
+
+    async def extract_aadhar_number(self, image_data):
         """Main function to extract Aadhar number"""
         try:
             logger.info("Starting Aadhar number extraction")
             
+            image_input = ImageInput.coerce(image_data)
+
             # Handle URL case
-            if image_data.startswith(('http://', 'https://')):
+            if image_input.is_url:
                 logger.info("Processing URL image")
-                return self._process_with_groq(image_data)
+                AADHAR_RESULTS.labels("url").inc()
+                return await self._process_with_groq(image_input.url)
 
-            # Decode base64 image
-            image = self._decode_base64(image_data)
-            if image is None:
+            image_bytes = image_input.raw
+            if not image_bytes:
                 raise ValueError("Invalid image data")
 
-            # Preprocess image
-            preprocessed = self._preprocess_image(image)
-            if preprocessed is None:
-                raise ValueError("Image preprocessing failed")
+            # With the model's circuit open, skip it and make OCR more thorough instead
+            ocr_only = not model_router.available()
+            if ocr_only:
+                logger.warning("Model API unavailable, extracting with OCR only")
 
-            # Try OCR
-            text = pytesseract.image_to_string(
-                preprocessed, 
-                config='--psm 7 -c tessedit_char_whitelist=0123456789'
-            )
-            
-            # Clean and validate number
-            aadhar_number = ''.join(filter(str.isdigit, text))
-            if self._validate_aadhar_number(aadhar_number):
-                logger.info("Successfully extracted Aadhar number using OCR")
-                return aadhar_number
+            # Decode and OCR the localised number line in the CPU pool
+            aadhar_number, outcome = await cpu_pool.run_with_image(_ocr_shared_image, image_bytes, ocr_only)
+            result = self.ocr_result(aadhar_number, outcome, ocr_only)
+            if result:
+                return result
 
             # Fallback to Groq API
             logger.info("OCR failed, falling back to Groq API")
-            encoded_image = base64.b64encode(cv2.imencode('.png', image)[1]).decode('utf-8')
-            result = self._process_with_groq(f"data:image/png;base64,{encoded_image}")
+            result = await self._process_with_groq(await compact_for_model(image_input, "aadhar"))
             
             if result:
+                AADHAR_RESULTS.labels("groq").inc()
                 return result
+            AADHAR_RESULTS.labels("none").inc()
             return "No valid Aadhar number detected"
 
         except Exception as e:
             logger.error(f"Error in Aadhar number extraction: {str(e)}")
             raise
+
+
+_pool_processor = None
+
+
+def ocr_image(image, ocr_only=False):
+    """Localisation and OCR of a decoded image in a pool process, returning (number, outcome)"""
+    global _pool_processor
+    if _pool_processor is None:
+        # One processor (and tesseract handle) per pool process
+        _pool_processor = AadharCardProcessor()
+    return _pool_processor._extract_with_ocr(image, ocr_only)
+
+
+def _ocr_shared_image(shared, ocr_only=False):
+    """CPU pool task: decode the shared image and run localisation and OCR, returning (number, outcome)"""
+    image = read_shared_image(shared)
+    if image is None:
+        raise ValueError("Invalid image data")
+    return ocr_image(image, ocr_only)
@@ -1,13 +1,12 @@
 import cv2
 import numpy as np
-import base64
-from groq import Groq
-import pytesseract
+import threading
+from modules.model_router import model_router, parse_confidence
+from modules.image_utils import ImageInput
+from modules.image_compaction import compact_for_model
+from modules.metrics import BARCODE_RESULTS, observe_stage
+from modules.cpu_pool import cpu_pool, read_shared_image
 import logging
-import os
-from PIL import Image
-import io
-import re
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -15,45 +14,202 @@ logger = logging.getLogger(__name__)
 
 
 class BarcodeScanner:
+    PROMPT = (
+        "Read and return only the barcode value from this image, followed by a confidence percentage. "
+        "Return only the decoded value and the percentage, no other text."
+    )
+    # Bump when the response shape or local pipeline changes
+    PIPELINE_VERSION = "local-first-1"
+
+    # Shorter model answers are not a barcode read
+    MIN_VALUE_LENGTH = 4
+
+    # Images smaller than this are upscaled for an extra detection pass
+    UPSCALE_BELOW = 800
+
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    
-    def scan_barcode(self, image_data):
-        """Process image to extract barcode"""
+        # OpenCV detectors are not thread safe, keep one set per thread
+        self._local = threading.local()
+
+    def _preprocess_variants(self, image):
+        """Yield (name, image, scale, offset) variants to try, cheapest first"""
+        yield 'original', image, 1.0, 0
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        enhanced = clahe.apply(gray)
+        yield 'clahe', enhanced, 1.0, 0
+
+        _, binarized = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        yield 'otsu', binarized, 1.0, 0
+
+        # The barcode detector misses tightly cropped codes without a quiet zone
+        pad = max(enhanced.shape[:2]) // 2
+        yield 'padded', cv2.copyMakeBorder(enhanced, pad, pad, pad, pad, cv2.BORDER_REPLICATE), 1.0, pad
+
+        if max(gray.shape[:2]) < self.UPSCALE_BELOW:
+            upscaled = cv2.resize(enhanced, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
+            yield 'upscaled', upscaled, 2.0, 0
+
+    @staticmethod
+    def _bounding_box(points, scale, offset):
+        """Convert detector corner points to an axis aligned box in source pixels"""
+        points = (np.asarray(points, dtype=np.float32).reshape(-1, 2) - offset) / scale
+        x_min, y_min = points.min(axis=0)
+        x_max, y_max = points.max(axis=0)
+        return {
+            'left': int(round(x_min)),
+            'top': int(round(y_min)),
+            'width': int(round(x_max - x_min)),
+            'height': int(round(y_max - y_min))
+        }
+
+    def _detect_barcodes(self, image, scale, offset):
+        """Decode 1D barcodes with OpenCV's barcode detector"""
+        detector = getattr(self._local, 'barcode_detector', None)
+        if detector is None:
+            detector = self._local.barcode_detector = cv2.barcode.BarcodeDetector()
+
+        # OpenCV >= 4.8 renamed the typed variant of detectAndDecode
+        if hasattr(detector, 'detectAndDecodeWithType'):
+            ok, infos, types, points = detector.detectAndDecodeWithType(image)
+        else:
+            ok, infos, types, points = detector.detectAndDecode(image)
+        if not ok or points is None:
+            return []
+
+        return [
+            {'type': code_type, 'data': data, 'rect': self._bounding_box(corners, scale, offset)}
+            for data, code_type, corners in zip(infos, types, points)
+            if data
+        ]
+
+    def _detect_qr_codes(self, image, scale, offset):
+        """Decode QR codes with OpenCV's QR detector"""
+        detector = getattr(self._local, 'qr_detector', None)
+        if detector is None:
+            detector = self._local.qr_detector = cv2.QRCodeDetector()
+
+        ok, infos, points, _ = detector.detectAndDecodeMulti(image)
+        if not ok or points is None:
+            return []
+
+        return [
+            {'type': 'QRCODE', 'data': data, 'rect': self._bounding_box(corners, scale, offset)}
+            for data, corners in zip(infos, points)
+            if data
+        ]
+
+    def _local_code_scan(self, image):
+        """Attempt to decode codes on the CPU, trying each preprocessing variant"""
+        for name, variant, scale, offset in self._preprocess_variants(image):
+            try:
+                codes = (
+                    self._detect_barcodes(variant, scale, offset)
+                    + self._detect_qr_codes(variant, scale, offset)
+                )
+            except cv2.error as e:
+                logger.error(f"Local decoding failed on '{name}' variant: {str(e)}")
+                continue
+
+            if codes:
+                # The same code can be reported by both passes on some images
+                unique = {}
+                for code in codes:
+                    unique.setdefault((code['type'], code['data']), code)
+                logger.info(f"Decoded {len(unique)} code(s) locally using '{name}' variant")
+                return list(unique.values())
+        return []
+
+    def _parse_model_answer(self, text):
+        """Return (value, confidence); answers too short to be a barcode always escalate"""
+        value, confidence = parse_confidence(text)
+        if len(value) < self.MIN_VALUE_LENGTH:
+            return value, None
+        return value, confidence
+
+    async def _process_with_groq(self, image_content):
+        """Read the barcode value with the vision model"""
+        return await model_router.complete(
+            "barcode",
+            self._parse_model_answer,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.PROMPT
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_content}
+                        }
+                    ]
+                }
+            ],
+            temperature=0.0,
+            max_tokens=100
+        )
+
+    def local_result(self, codes):
+        """Response for locally decoded codes"""
+        BARCODE_RESULTS.labels("local").inc()
+        return {"barcode_value": codes[0]['data'], "codes": codes, "source": "local"}
+
+    def model_result(self, barcode_value):
+        """Response for the model's reading of the barcode"""
+        if len(barcode_value) < self.MIN_VALUE_LENGTH:
+            return {"barcode_value": "No valid barcode detected", "codes": [], "source": "groq"}
+        codes = [{'type': 'unknown', 'data': barcode_value, 'rect': None}]
+        return {"barcode_value": barcode_value, "codes": codes, "source": "groq"}
+
+    async def scan_barcode(self, image_data):
+        """Process image to extract barcodes, decoding locally before calling the model"""
         try:
             logger.info("Starting barcode scanning")
-            
-            if image_data.startswith(('http://', 'https://')):
-                image_content = image_data
+
+            image_input = ImageInput.coerce(image_data)
+            if image_input.is_url:
+                image_content = image_input.url
             else:
-                image_content = f"data:image/png;base64,{image_data}"
-
-            chat_completion = self.groq_client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Read and return only the barcode value from this image. Return only the decoded value, no other text."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_content}
-                            }
-                        ]
-                    }
-                ],
-                model="llama-3.2-90b-vision-preview",
-                temperature=0.0,
-                max_tokens=100
-            )
-
-            barcode_value = chat_completion.choices[0].message.content.strip()
+                image_bytes = image_input.raw
+                if not image_bytes:
+                    raise ValueError("Invalid image data")
+
+                # Decode and try the CPU decoders first, in the CPU pool
+                codes = await cpu_pool.run_with_image(_scan_shared_image, image_bytes)
+                if codes:
+                    return self.local_result(codes)
+
+                logger.info("Local decoding failed, falling back to Groq API")
+                image_content = await compact_for_model(image_input, "barcode")
+
+            barcode_value = await self._process_with_groq(image_content)
             logger.info(f"Barcode scanning complete: {barcode_value}")
-            
-            return barcode_value if len(barcode_value) >= 4 else "No valid barcode detected"
+            BARCODE_RESULTS.labels("groq").inc()
+            return self.model_result(barcode_value)
 
         except Exception as e:
             logger.error(f"Error in barcode scanning: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+_pool_scanner = None
+
+
+def scan_image(image):
+    """Run the local decoders on a decoded image in a pool process"""
+    global _pool_scanner
+    if _pool_scanner is None:
+        _pool_scanner = BarcodeScanner()
+    with observe_stage("barcode_decode"):
+        return _pool_scanner._local_code_scan(image)
+
+
+def _scan_shared_image(shared):
+    """CPU pool task: decode the shared image and run the local decoders"""
+    image = read_shared_image(shared)
+    if image is None:
+        raise ValueError("Invalid image data")
+    return scan_image(image)
@@ -0,0 +1,125 @@
+import os
+import time
+import logging
+from collections import deque
+from modules.metrics import BREAKER_STATE, BREAKER_TRANSITIONS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Open once at least BREAKER_MIN_CALLS calls in the last BREAKER_WINDOW
+# seconds were seen and BREAKER_ERROR_RATE of them failed
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# How long an open breaker rejects calls before letting a probe through
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "15"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """A call was rejected without being sent because the upstream is failing."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Model API circuit for {name} is open, failing fast")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker around one upstream, per worker process.
+
+    Closed, calls flow and their outcomes are counted over a sliding window.
+    When the error rate crosses the threshold the breaker opens and rejects
+    calls for the cooldown; then a single probe is let through (half open)
+    whose outcome closes or re-opens it.
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        BREAKER_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit for {self.name} {self.state} -> {state}")
+        self.state = state
+        BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through."""
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def rejecting(self):
+        """Whether calls are currently being rejected, without claiming the probe."""
+        if self.state == OPEN:
+            return self.retry_after() > 0
+        return self.state == HALF_OPEN and self._probing
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError(self.name, self.cooldown)
+            self._probing = True
+
+    def record(self, ok):
+        """Count the outcome of a call that was allowed through."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            # A call that started before the breaker opened
+            return
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        if ok or len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for _, outcome in self._outcomes if not outcome)
+        if failures / len(self._outcomes) >= self.error_rate:
+            self._open(now)
+
+    def release(self):
+        """Give back a probe that ended without an outcome, e.g. because it was cancelled."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def _open(self, now):
+        self._opened_at = now
+        self._outcomes.clear()
+        self._transition(OPEN)
+
+
+_breakers = {}
+
+
+def breaker_for(name):
+    """The breaker guarding calls to ``name`` (a model) in this process."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
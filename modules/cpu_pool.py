@@ -0,0 +1,248 @@
+import os
+import pickle
+import asyncio
+import itertools
+import importlib
+import logging
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from modules.metrics import observe_stage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# gunicorn.conf.py exports its worker count so the cores can be split between
+# the pools of all workers instead of every worker claiming all of them
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS", "1")))
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", "0")) or max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+# Video analysis waits on the network while it decodes (FFmpeg streams the
+# clip, downloads can take minutes), so it runs in a small pool of its own
+# rather than holding the CPU pool's slots away from OCR and image decoding
+VIDEO_POOL_SIZE = int(os.getenv("VIDEO_POOL_SIZE", "2"))
+
+# Encoded image bytes placed in shared memory for a pool task
+SharedImage = namedtuple('SharedImage', ['name', 'size'])
+# How often a streamed task is checked for having died without finishing
+EVENT_POLL_SECONDS = 1.0
+# Put on a streamed task's event queue once it has returned or raised
+_END_OF_EVENTS = "__end__"
+
+
+# OpenCV and numpy are only needed inside the pool processes, the functions
+# below import them there so the web workers can start without them
+
+
+def _init_worker():
+    import cv2
+    # One pool process per core already, OpenCV's own threads would oversubscribe
+    cv2.setNumThreads(1)
+
+
+def _warm(modules):
+    """Pool task that imports the task modules ahead of the first real task."""
+    for module in modules:
+        importlib.import_module(module)
+    return os.getpid()
+
+
+class PoolTaskError(Exception):
+    """A pool task's exception that could not be sent back to the web worker as is."""
+
+    def __init__(self, type_name, message):
+        super().__init__(type_name, message)
+        self.type_name = type_name
+        self.message = message
+
+    def __str__(self):
+        return f"{self.type_name}: {self.message}"
+
+
+def _call(func, *args):
+    """Pool-side wrapper for every task: keep its exception picklable.
+
+    An exception that fails to unpickle in the web worker (e.g. one whose
+    __init__ takes other arguments than it stores) is reported as a broken
+    pool, which would restart the pool and fail every other task in flight.
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise PoolTaskError(type(e).__name__, str(e)) from None
+        raise
+
+
+class _StreamEvents:
+    """The ``events`` queue a streamed task sees: puts on the shared relay queue, tagged with its stream."""
+
+    def __init__(self, relay, stream_id):
+        self.relay = relay
+        self.stream_id = stream_id
+
+    def put(self, event):
+        self.relay.put((self.stream_id, event))
+
+
+def _run_streamed(func, events, *args):
+    """Pool task wrapper for ``CPUPool.stream``: run ``func`` and then end its event stream."""
+    try:
+        return func(*args, events)
+    finally:
+        events.put((_END_OF_EVENTS, None))
+
+
+def read_shared_image(shared):
+    """Decode a SharedImage to an OpenCV BGR image, or None if undecodable."""
+    import cv2
+    import numpy as np
+    # Pool processes share the parent's resource tracker, so attaching does
+    # not take ownership; the parent unlinks the block when the task is done
+    shm = SharedMemory(name=shared.name)
+    data = None
+    try:
+        data = np.ndarray((shared.size,), dtype=np.uint8, buffer=shm.buf)
+        with observe_stage("image_decode"):
+            return cv2.imdecode(data, cv2.IMREAD_COLOR)
+    finally:
+        # The view must be dropped before the mapping can be closed
+        data = None
+        shm.close()
+
+
+class CPUPool:
+    """Bounded process pool for CPU-heavy stages (OpenCV, tesseract, video analysis).
+
+    The gunicorn workers stay few and asynchronous, waiting on the network,
+    while decoding and OCR run here in parallel without holding the GIL of the
+    worker serving requests. Images are handed over through shared memory so
+    large payloads are copied once instead of being pickled.
+    """
+
+    def __init__(self, size=CPU_POOL_SIZE, name="CPU"):
+        self.size = size
+        self.name = name
+        self._executor = None
+        self._manager = None
+        self._relay = None
+        self._streams = {}
+        self._stream_ids = itertools.count()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn, not fork: forking a process that has OpenCV threads running can deadlock
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"Started {self.name} pool with {self.size} processes (pid {os.getpid()})")
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run a picklable module-level function in the pool."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), _call, func, *args)
+        except BrokenProcessPool:
+            # A pool process died (e.g. a native crash), start afresh for the next call
+            logger.error(f"{self.name} pool process died, restarting the pool")
+            self.shutdown()
+            raise
+
+    async def run_with_image(self, func, image_bytes, *args):
+        """Run ``func(SharedImage, *args)`` with the encoded image in shared memory."""
+        shm = SharedMemory(create=True, size=max(1, len(image_bytes)))
+        try:
+            shm.buf[:len(image_bytes)] = image_bytes
+            return await self.run(func, SharedImage(shm.name, len(image_bytes)), *args)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _get_relay(self):
+        if self._relay is None:
+            # One queue for the events of every streamed task, served by a
+            # manager process that is only started once a stream is used
+            self._manager = multiprocessing.get_context("spawn").Manager()
+            self._relay = self._manager.Queue()
+            threading.Thread(
+                target=self._relay_events, args=(self._relay,), name="cpu-pool-events", daemon=True
+            ).start()
+        return self._relay
+
+    def _relay_events(self, relay):
+        """Relay thread: hand each streamed event to the event loop of the stream awaiting it."""
+        while True:
+            try:
+                stream_id, event = relay.get()
+            except (EOFError, OSError):
+                # The manager was shut down
+                return
+            if stream_id is None:
+                return
+            stream = self._streams.get(stream_id)
+            if stream is not None:
+                loop, events = stream
+                loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def stream(self, func, *args):
+        """Run ``func(*args, events)`` in the pool, yielding its progress as it happens.
+
+        The task reports by putting ``(name, data)`` pairs on ``events``; they
+        are yielded as they arrive, followed by ``("result", return value)``.
+        A single relay thread serves all streams, so open streams do not tie
+        up the default executor's threads.
+        """
+        stream_id = next(self._stream_ids)
+        events = asyncio.Queue()
+        self._streams[stream_id] = (asyncio.get_running_loop(), events)
+        task = asyncio.ensure_future(
+            self.run(_run_streamed, func, _StreamEvents(self._get_relay(), stream_id), *args)
+        )
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), EVENT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if task.done():
+                        # The pool process died before it could end the stream
+                        break
+                    continue
+                if event[0] == _END_OF_EVENTS:
+                    break
+                yield event
+            yield "result", await task
+        finally:
+            self._streams.pop(stream_id, None)
+            if not task.done():
+                # The caller went away; the pool process finishes the task regardless
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    async def warm(self, modules=()):
+        """Start the pool processes and import ``modules`` in them, returning the count."""
+        pids = await asyncio.gather(*(self.run(_warm, tuple(modules)) for _ in range(self.size)))
+        return len(set(pids))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            try:
+                self._relay.put((None, None))
+            except (EOFError, OSError):
+                pass
+            self._manager.shutdown()
+            self._manager = None
+            self._relay = None
+
+
+cpu_pool = CPUPool()
+video_pool = CPUPool(VIDEO_POOL_SIZE, "video")
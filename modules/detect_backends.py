@@ -0,0 +1,174 @@
+import os
+import logging
+from modules.cpu_pool import cpu_pool, read_shared_image
+from modules.metrics import DETECT_DECISIONS, observe_stage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Backends asked in order; each one either answers or passes the image on.
+# e.g. "local,groq" pre-filters on the CPU and only sends ambiguous images out
+DETECT_BACKENDS = os.getenv("DETECT_BACKENDS", "groq")
+
+# Classifier for the local backend, anything cv2.dnn.readNet loads (ONNX is
+# the safe choice across OpenCV versions). DETECT_LOCAL_CONFIG is the second
+# file for formats that split the network description from the weights.
+LOCAL_MODEL = os.getenv("DETECT_LOCAL_MODEL", "")
+LOCAL_CONFIG = os.getenv("DETECT_LOCAL_CONFIG", "")
+# Output indices that mean "plastic garbage"; their probabilities are summed
+LOCAL_POSITIVE_CLASSES = os.getenv("DETECT_LOCAL_POSITIVE_CLASSES", "1")
+LOCAL_INPUT_SIZE = int(os.getenv("DETECT_LOCAL_INPUT_SIZE", "224"))
+# Preprocessing is blob = (pixel - mean) * scale in RGB order
+LOCAL_SCALE = float(os.getenv("DETECT_LOCAL_SCALE", str(1 / 255)))
+LOCAL_MEAN = os.getenv("DETECT_LOCAL_MEAN", "0,0,0")
+# Probabilities at or beyond these are answered locally
+LOCAL_YES_THRESHOLD = float(os.getenv("DETECT_LOCAL_YES", "0.9"))
+LOCAL_NO_THRESHOLD = float(os.getenv("DETECT_LOCAL_NO", "0.1"))
+
+
+class LocalClassifier:
+    """OpenCV DNN image classifier returning the probability of plastic garbage."""
+
+    def __init__(self, model=LOCAL_MODEL, config=LOCAL_CONFIG, positive_classes=LOCAL_POSITIVE_CLASSES,
+                 input_size=LOCAL_INPUT_SIZE, scale=LOCAL_SCALE, mean=LOCAL_MEAN):
+        import cv2
+        self.net = cv2.dnn.readNet(model, config)
+        self.positive_classes = [int(index) for index in positive_classes.split(",")]
+        self.input_size = input_size
+        self.scale = scale
+        self.mean = tuple(float(value) for value in mean.split(","))
+
+    def probability(self, image):
+        import cv2
+        import numpy as np
+        blob = cv2.dnn.blobFromImage(
+            image, self.scale, (self.input_size, self.input_size), self.mean, swapRB=True, crop=False
+        )
+        self.net.setInput(blob)
+        scores = self.net.forward().reshape(-1).astype(np.float64)
+
+        if scores.size == 1:
+            # Single output: a probability, or a logit if outside [0, 1]
+            score = scores[0]
+            return float(score if 0.0 <= score <= 1.0 else 1.0 / (1.0 + np.exp(-score)))
+        if scores.min() < 0.0 or abs(scores.sum() - 1.0) > 1e-3:
+            # Logits, the network has no softmax layer of its own
+            scores = np.exp(scores - scores.max())
+            scores /= scores.sum()
+        return float(scores[self.positive_classes].sum())
+
+
+_pool_classifier = None
+
+
+def classify_image(image):
+    """The local classifier's probability for a decoded image, in a pool process"""
+    global _pool_classifier
+    if _pool_classifier is None:
+        _pool_classifier = LocalClassifier()
+    with observe_stage("local_classify"):
+        return _pool_classifier.probability(image)
+
+
+def _classify_shared_image(shared):
+    """CPU pool task: decode the shared image and return the classifier's probability"""
+    image = read_shared_image(shared)
+    if image is None:
+        raise ValueError("Invalid image data")
+    return classify_image(image)
+
+
+class LocalBackend:
+    """Answers confident cases from the local classifier, in the CPU pool.
+
+    Images whose probability falls between the two thresholds are passed on,
+    unless this is the last backend, in which case 0.5 decides. URL inputs are
+    always passed on, the image is only ever fetched by the model API.
+    """
+    name = "local"
+
+    def __init__(self, model=LOCAL_MODEL, yes_threshold=LOCAL_YES_THRESHOLD, no_threshold=LOCAL_NO_THRESHOLD):
+        if not model:
+            raise ValueError("DETECT_BACKENDS includes 'local' but DETECT_LOCAL_MODEL is not set")
+        self.model = model
+        self.yes_threshold = yes_threshold
+        self.no_threshold = no_threshold
+
+    def version(self):
+        stat = os.stat(self.model)
+        return f"local:{os.path.basename(self.model)}:{stat.st_size}:{int(stat.st_mtime)}:{self.no_threshold:g}-{self.yes_threshold:g}"
+
+    async def predict(self, image_input, final=False):
+        if image_input.is_url:
+            return None
+        image_bytes = image_input.raw
+        if not image_bytes:
+            raise ValueError("Invalid image data")
+
+        return self.decide(await cpu_pool.run_with_image(_classify_shared_image, image_bytes), final)
+
+    def decide(self, probability, final=False):
+        """Answer for a classifier probability, or None to pass the image on"""
+        if probability >= self.yes_threshold:
+            return True
+        if probability <= self.no_threshold:
+            return False
+        if final:
+            return probability >= 0.5
+        logger.info(f"Local classifier unsure (p={probability:.2f}), passing the image on")
+        return None
+
+
+class RemoteBackend:
+    """Asks the vision model through ``ask(image_input)``; always answers."""
+    name = "groq"
+
+    def __init__(self, ask, version):
+        self.ask = ask
+        self._version = version
+
+    def version(self):
+        return self._version()
+
+    async def predict(self, image_input, final=False):
+        return await self.ask(image_input)
+
+
+class DetectBackends:
+    """Ordered chain of detection backends; the first one to answer wins."""
+
+    def __init__(self, backends):
+        if not backends:
+            raise ValueError("No detect backends configured")
+        self.backends = backends
+
+    def version(self):
+        """Configuration of the chain, part of the result cache version."""
+        return ",".join(backend.version() for backend in self.backends)
+
+    async def predict(self, image_input):
+        last = len(self.backends) - 1
+        for position, backend in enumerate(self.backends):
+            result = await backend.predict(image_input, final=position == last)
+            if result is not None:
+                DETECT_DECISIONS.labels(backend.name).inc()
+                return result
+        raise ValueError("No detect backend could classify this image")
+
+
+def build_detect_backends(ask_remote, remote_version, names=DETECT_BACKENDS):
+    """Build the chain named by ``names`` (e.g. "local,groq")."""
+    factories = {
+        "local": LocalBackend,
+        "groq": lambda: RemoteBackend(ask_remote, remote_version),
+    }
+    backends = []
+    for name in (name.strip() for name in names.split(",")):
+        if not name:
+            continue
+        if name not in factories:
+            raise ValueError(f"Unknown detect backend '{name}', expected one of {sorted(factories)}")
+        backends.append(factories[name]())
+    logger.info(f"Detect backends: {', '.join(backend.name for backend in backends)}")
+    return DetectBackends(backends)
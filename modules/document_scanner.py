@@ -0,0 +1,226 @@
+import re
+import json
+import logging
+from modules.model_router import model_router
+from modules.image_utils import ImageInput
+from modules.image_compaction import COMPACTION_PROFILES, DEFAULT_PROFILE, compact_for_model
+from modules.metrics import AADHAR_RESULTS, BARCODE_RESULTS, DETECT_DECISIONS, SCAN_TASKS
+from modules.cpu_pool import cpu_pool, read_shared_image
+from modules.aadhar_processor import ocr_image
+from modules.barcode_scanner import scan_image
+from modules.detect_backends import LocalBackend, classify_image
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tasks /scan can run, in the order their answers are listed
+SCAN_TASKS_AVAILABLE = ("aadhar", "barcode", "detect")
+
+JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
+
+class DocumentScanner:
+    """Runs several image tasks on one upload: /aadhar, /barcode and /detect in one pass.
+
+    The image is decoded once in the CPU pool, where each task's local stage
+    runs on the same array. Whatever is left unanswered goes to the model
+    with a single prompt asking for every remaining task as JSON; each
+    answer is then validated by its own task's rules. Results have the same
+    shape as the single-task endpoints.
+
+    Like the single-task endpoints, the prompt goes to the small model first
+    and is sent once more to the large model unless every answer is valid and
+    meets its own task's threshold, so a scan makes at most two model calls
+    (one per tier) where the separate endpoints could make up to six.
+    """
+    PROMPT = (
+        "Look at this image and return only a JSON object with these keys:\n{fields}\n"
+        "Each value is an object {{\"value\": ..., \"confidence\": percentage from 0 to 100}}."
+    )
+    FIELDS = {
+        "aadhar": '"aadhar": the 12-digit Aadhar number as a string, or null if there is none',
+        "barcode": '"barcode": the decoded barcode value as a string, or null if there is none',
+        "detect": '"detect": "YES" if the image shows plastic garbage, otherwise "NO"',
+    }
+    # Bump when the local stages or the validation change
+    PIPELINE_VERSION = "scan-1"
+
+    def __init__(self, aadhar_processor, barcode_scanner, detector):
+        self.aadhar = aadhar_processor
+        self.barcode = barcode_scanner
+        self.detector = detector
+
+    def parse_tasks(self, tasks):
+        """Requested task names from a comma separated list, in canonical order"""
+        requested = {task.strip() for task in tasks.split(",") if task.strip()}
+        unknown = requested.difference(SCAN_TASKS_AVAILABLE)
+        if unknown:
+            raise ValueError(f"Unknown scan task(s) {sorted(unknown)}, expected some of {list(SCAN_TASKS_AVAILABLE)}")
+        if not requested:
+            raise ValueError("No scan tasks requested")
+        return tuple(task for task in SCAN_TASKS_AVAILABLE if task in requested)
+
+    def version(self, tasks):
+        """Everything the answer for ``tasks`` depends on, for the result cache"""
+        return "|".join((
+            ",".join(tasks),
+            model_router.version("scan"),
+            self.PROMPT,
+            self.PIPELINE_VERSION,
+            self.aadhar.PIPELINE_VERSION,
+            self.barcode.PIPELINE_VERSION,
+            self.detector.detect_backends.version(),
+        ))
+
+    def _local_detect_backend(self):
+        """The detect chain's local classifier and whether it has the last word, or (None, False)"""
+        backends = self.detector.detect_backends.backends
+        if isinstance(backends[0], LocalBackend):
+            return backends[0], len(backends) == 1
+        return None, False
+
+    def _local_results(self, tasks, found, ocr_only, detect_backend, detect_final):
+        """Responses for the tasks their local stage answered"""
+        results = {}
+        if "aadhar" in tasks:
+            aadhar_number = self.aadhar.ocr_result(*found["aadhar"], ocr_only)
+            if aadhar_number:
+                results["aadhar"] = {"aadhar_number": aadhar_number}
+        if "barcode" in tasks and found["barcode"]:
+            results["barcode"] = self.barcode.local_result(found["barcode"])
+        if "detect" in found:
+            plastic = detect_backend.decide(found["detect"], detect_final)
+            if plastic is not None:
+                DETECT_DECISIONS.labels(detect_backend.name).inc()
+                results["detect"] = {"plastic_garbage": "YES" if plastic else "NO"}
+        return results
+
+    def _validate(self, task, value):
+        """(response, valid) for the model's value for ``task``"""
+        if task == "aadhar":
+            aadhar_number = ''.join(filter(str.isdigit, str(value or '')))
+            if self.aadhar.validate_aadhar_number(aadhar_number):
+                return {"aadhar_number": aadhar_number}, True
+            return {"aadhar_number": "Invalid Aadhar number detected"}, False
+        if task == "barcode":
+            barcode_value = str(value or '').strip()
+            return self.barcode.model_result(barcode_value), len(barcode_value) >= self.barcode.MIN_VALUE_LENGTH
+        answer = str(value or '').strip().upper()
+        return {"plastic_garbage": "YES" if answer == "YES" else "NO"}, answer in ("YES", "NO")
+
+    def _parse_model_answer(self, tasks):
+        """Parser for model_router: (responses, 100 if every task met its own threshold else None)"""
+        def parse(text):
+            match = JSON_OBJECT.search(text)
+            try:
+                answer = json.loads(match.group(0)) if match else {}
+            except ValueError:
+                answer = {}
+            if not isinstance(answer, dict):
+                answer = {}
+
+            results = {}
+            sure = bool(answer)
+            for task in tasks:
+                field = answer.get(task)
+                if not isinstance(field, dict):
+                    # A bare value without a confidence
+                    field = {"value": field}
+                results[task], valid = self._validate(task, field.get("value"))
+                try:
+                    confidence = float(field.get("confidence"))
+                except (TypeError, ValueError):
+                    confidence = None
+                if not valid or confidence is None or confidence < model_router.threshold(task):
+                    sure = False
+            return results, 100.0 if sure else None
+        return parse
+
+    async def _process_with_groq(self, image_input, tasks):
+        """Answer ``tasks`` with one prompt: a small-model call, escalated to the large model when unsure"""
+        # The task needing the most detail decides how far the image is compacted
+        detail = max(tasks, key=lambda task: COMPACTION_PROFILES.get(task, DEFAULT_PROFILE).max_side)
+        image_content = await compact_for_model(image_input, detail)
+        fields = "\n".join(self.FIELDS[task] for task in tasks)
+        return await model_router.complete(
+            "scan",
+            self._parse_model_answer(tasks),
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.PROMPT.format(fields=fields)
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_content}
+                        }
+                    ]
+                }
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.0,
+            max_tokens=60 + 60 * len(tasks)
+        )
+
+    async def scan(self, image_data, tasks):
+        """Run ``tasks`` on one image, returning {task: response}"""
+        try:
+            logger.info(f"Starting scan for {', '.join(tasks)}")
+            image_input = ImageInput.coerce(image_data)
+
+            # With the model's circuit open, make the Aadhar OCR more thorough instead
+            ocr_only = "aadhar" in tasks and not model_router.available()
+            detect_backend, detect_final = self._local_detect_backend() if "detect" in tasks else (None, False)
+
+            results = {}
+            if not image_input.is_url:
+                image_bytes = image_input.raw
+                if not image_bytes:
+                    raise ValueError("Invalid image data")
+                # One decode for all the local stages, in the CPU pool
+                found = await cpu_pool.run_with_image(
+                    _scan_shared_image, image_bytes, tasks, ocr_only, detect_backend is not None
+                )
+                results = self._local_results(tasks, found, ocr_only, detect_backend, detect_final)
+                for task in results:
+                    SCAN_TASKS.labels(task, "local").inc()
+
+            remaining = [task for task in tasks if task not in results]
+            if remaining:
+                logger.info(f"Asking the model for {', '.join(remaining)}")
+                answers = await self._process_with_groq(image_input, remaining)
+                # Counted with the single-task endpoints' results too
+                for task in remaining:
+                    if task == "aadhar":
+                        AADHAR_RESULTS.labels("url" if image_input.is_url else "groq").inc()
+                    elif task == "barcode":
+                        BARCODE_RESULTS.labels("groq").inc()
+                    else:
+                        DETECT_DECISIONS.labels("groq").inc()
+                    SCAN_TASKS.labels(task, "model").inc()
+                results.update(answers)
+
+            return {task: results[task] for task in tasks}
+
+        except Exception as e:
+            logger.error(f"Error in scan: {str(e)}")
+            raise
+
+
+def _scan_shared_image(shared, tasks, ocr_only=False, classify=False):
+    """CPU pool task: decode the shared image once and run each task's local stage"""
+    image = read_shared_image(shared)
+    if image is None:
+        raise ValueError("Invalid image data")
+    found = {}
+    if "aadhar" in tasks:
+        found["aadhar"] = ocr_image(image, ocr_only)
+    if "barcode" in tasks:
+        found["barcode"] = scan_image(image)
+    if classify:
+        found["detect"] = classify_image(image)
+    return found
@@ -0,0 +1,255 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+from groq import AsyncGroq, APIConnectionError, InternalServerError, RateLimitError
+from modules.groq_scheduler import (
+    BACKOFF_MAX, GROQ_RETRIES, QueueTimeoutError, backoff_delay, parse_duration, scheduler_for,
+)
+from modules.circuit_breaker import CircuitOpenError, breaker_for
+from modules.hedging import latency_tracker
+from modules.metrics import GROQ_REQUESTS, GROQ_RETRIED, GROQ_SECONDS, HEDGED_REQUESTS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Connection pool sizing for the shared client (per worker process)
+MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "30"))
+# Connections opened (TLS included) before the worker reports ready
+PREWARM_CONNECTIONS = int(os.getenv("GROQ_PREWARM_CONNECTIONS", "2"))
+PREWARM_TIMEOUT = float(os.getenv("GROQ_PREWARM_TIMEOUT", "5"))
+# Rough token cost of one image in a prompt, for the rate-limit budget
+IMAGE_TOKENS = int(os.getenv("GROQ_IMAGE_TOKENS", "1000"))
+
+# Errors worth retrying after a backoff; anything else is the request's fault
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+# The model API is out of capacity for us; callers should retry later
+UNAVAILABLE_ERRORS = RETRYABLE_ERRORS + (QueueTimeoutError, CircuitOpenError)
+
+_client = None
+
+
+def get_groq_client():
+    """Return the worker-wide AsyncGroq client, creating it on first use.
+
+    The client is built lazily so that every gunicorn worker opens its own
+    connection pool after the fork instead of sharing sockets with the master.
+    """
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            )
+        )
+        # Retries are done by create_chat_completion, through the scheduler
+        _client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+        logger.info(f"Created shared Groq client (max_connections={MAX_CONNECTIONS})")
+    return _client
+
+
+def estimate_tokens(messages, max_tokens=None, **kwargs):
+    """Upper-bound guess of the tokens a chat completion will be charged."""
+    tokens = max_tokens or 1024
+    for message in messages:
+        content = message.get("content")
+        parts = [content] if isinstance(content, str) else content or []
+        for part in parts:
+            if isinstance(part, str):
+                tokens += len(part) // 4 + 1
+            elif part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS
+            else:
+                tokens += len(part.get("text", "")) // 4 + 1
+    return tokens
+
+
+def retry_after(error):
+    """Seconds the API (or the scheduler) asked us to wait, or None."""
+    if isinstance(error, (QueueTimeoutError, CircuitOpenError)):
+        return error.retry_after
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    return parse_duration(response.headers.get("retry-after"))
+
+
+async def _send(task, scheduler, tokens, kwargs):
+    """Send one attempt, duplicated once it runs past the task's usual latency.
+
+    Whichever copy answers first wins and the other is cancelled. The
+    duplicate is only sent if the rate-limit budget allows it right away.
+    """
+    create = get_groq_client().chat.completions.with_raw_response.create
+    timeout = latency_tracker.timeout(task)
+    primary = asyncio.ensure_future(create(timeout=timeout, **kwargs))
+    pending = {primary}
+    try:
+        delay = latency_tracker.hedge_delay(task)
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and scheduler.try_acquire(task, tokens):
+                HEDGED_REQUESTS.labels(task, "sent").inc()
+                pending.add(asyncio.ensure_future(create(timeout=timeout, **kwargs)))
+
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Retrieve every exception, a failed copy may lose to one that succeeds
+            failures = [call.exception() for call in done if call.exception() is not None]
+            for call in done:
+                if call.exception() is None:
+                    if call is not primary:
+                        HEDGED_REQUESTS.labels(task, "won").inc()
+                    return call.result()
+            if not pending:
+                raise failures[0]
+    finally:
+        for call in pending:
+            call.cancel()
+
+
+async def _admit(task, kwargs, send):
+    """Make one logical call through the model's breaker, budget and retries.
+
+    ``send(scheduler, tokens)`` issues a single attempt and returns the raw
+    response. Rate limits, server errors and connection failures are retried
+    with jittered backoff; a 429 also pauses the other queued calls for its
+    Retry-After. Returns the response, the breaker whose outcome the caller
+    still has to record, and when the successful attempt was sent.
+    """
+    model = kwargs.get("model")
+    scheduler = scheduler_for(model)
+    breaker = breaker_for(model)
+    tokens = estimate_tokens(**kwargs)
+    for attempt in range(GROQ_RETRIES + 1):
+        breaker.check()
+        started = time.perf_counter()
+        try:
+            await scheduler.acquire(task, tokens)
+            started = time.perf_counter()
+            response = await send(scheduler, tokens)
+        except RETRYABLE_ERRORS as e:
+            # A 429 is the API answering, only errors and timeouts count against it
+            breaker.record(isinstance(e, RateLimitError))
+            GROQ_REQUESTS.labels(task, type(e).__name__).inc()
+            GROQ_SECONDS.labels(task).observe(time.perf_counter() - started)
+            if getattr(e, "response", None) is not None:
+                scheduler.update(e.response.headers)
+            wait = retry_after(e)
+            if isinstance(e, RateLimitError):
+                scheduler.pause(wait or backoff_delay(attempt))
+            if attempt == GROQ_RETRIES or (wait and wait > BACKOFF_MAX):
+                raise
+            delay = backoff_delay(attempt, wait)
+            GROQ_RETRIED.labels(task, type(e).__name__).inc()
+            logger.warning(f"Groq {task} call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        except QueueTimeoutError:
+            breaker.release()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            # The API answered, the request itself was rejected
+            breaker.record(True)
+            GROQ_REQUESTS.labels(task, type(e).__name__).inc()
+            GROQ_SECONDS.labels(task).observe(time.perf_counter() - started)
+            raise
+        scheduler.update(response.headers)
+        return response, breaker, started
+
+
+async def create_chat_completion(task, **kwargs):
+    """Run a chat completion on the shared client, recording latency and outcome per task.
+
+    Every call waits for rate-limit budget in the scheduler first and
+    transient failures are retried (see ``_admit``). Each attempt has the
+    task's timeout and is hedged when it runs long, and calls fail fast with
+    CircuitOpenError while the model's breaker is open.
+    """
+    response, breaker, started = await _admit(
+        task, kwargs, lambda scheduler, tokens: _send(task, scheduler, tokens, kwargs)
+    )
+    breaker.record(True)
+    elapsed = time.perf_counter() - started
+    latency_tracker.observe(task, elapsed)
+    GROQ_SECONDS.labels(task).observe(elapsed)
+    GROQ_REQUESTS.labels(task, "ok").inc()
+    return await response.parse()
+
+
+async def stream_chat_completion(task, **kwargs):
+    """Stream a chat completion, yielding the text of each chunk as it arrives.
+
+    Admission, retries and the breaker work as in ``create_chat_completion``,
+    but only until the response starts: a stream that fails halfway is not
+    restarted, since its text has already been passed on. Streams are not
+    hedged and the task's timeout bounds the wait for each chunk.
+    """
+    create = get_groq_client().chat.completions.with_raw_response.create
+    response, breaker, started = await _admit(
+        task, kwargs,
+        lambda scheduler, tokens: create(stream=True, timeout=latency_tracker.timeout(task), **kwargs),
+    )
+    stream = await response.parse()
+    outcome = None
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        outcome = "ok"
+    except Exception as e:
+        # The stream broke off after the API had accepted the call
+        outcome = type(e).__name__
+        raise
+    finally:
+        await stream.close()
+        if outcome is None:
+            # Abandoned by the caller, e.g. the client disconnected
+            breaker.release()
+        else:
+            breaker.record(outcome == "ok")
+            GROQ_REQUESTS.labels(task, outcome).inc()
+            GROQ_SECONDS.labels(task).observe(time.perf_counter() - started)
+
+
+async def prewarm_groq_client(connections=PREWARM_CONNECTIONS, timeout=PREWARM_TIMEOUT):
+    """Open pooled connections to the model API ahead of the first request.
+
+    Issues concurrent model-list calls, which are cheap and authenticated, so
+    the handshakes happen at boot. Failures are logged and never block startup.
+    Returns the number of connections that succeeded.
+    """
+    if connections <= 0:
+        return 0
+
+    client = get_groq_client().with_options(max_retries=0, timeout=timeout)
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(client.models.list() for _ in range(connections)), return_exceptions=True),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Groq connection pre-warm timed out after {timeout}s")
+        return 0
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        logger.warning(f"Groq connection pre-warm failed for {len(failures)} connection(s): {str(failures[0])}")
+    return connections - len(failures)
+
+
+async def close_groq_client():
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
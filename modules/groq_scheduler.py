@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+from modules.metrics import GROQ_BUDGET, GROQ_QUEUE_DEPTH, GROQ_QUEUE_WAIT
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Budgets per worker process, 0 for none. The token budget is replaced by
+# the per-minute limit the API reports in its headers; the API only reports
+# a daily request limit, so the per-minute request budget stays as configured
+REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "0"))
+TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "0"))
+
+# Lower runs first; override per task with e.g. GROQ_PRIORITY_DETECT=0.
+# A streamed analysis has a client watching, unlike a background job
+DEFAULT_PRIORITIES = {"aadhar": 0, "barcode": 0, "scan": 0, "detect": 1, "analyze_stream": 1, "analyze": 2}
+
+# Longest a call may wait for budget before failing, per task
+QUEUE_TIMEOUT = float(os.getenv("GROQ_QUEUE_TIMEOUT", "30"))
+DEFAULT_QUEUE_TIMEOUTS = {"analyze": 300}
+
+# Retries of 429/5xx/connection errors, with full-jitter exponential backoff.
+# A Retry-After beyond BACKOFF_MAX is not waited out but returned to the caller
+GROQ_RETRIES = int(os.getenv("GROQ_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "20"))
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class QueueTimeoutError(Exception):
+    """A model call waited longer than its queue timeout for rate-limit budget."""
+
+    def __init__(self, task, waited, retry_after):
+        super().__init__(f"Model API budget exhausted, {task} call waited {waited:.0f}s")
+        self.retry_after = retry_after
+
+
+def parse_duration(value):
+    """Seconds in a rate-limit reset value such as '7.66s', '2m59.56s' or '12'."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter delay before retry ``attempt`` (0-based), never below Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class TokenBucket:
+    """Budget refilled continuously at ``capacity`` per ``period`` seconds; 0 is unlimited."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = capacity
+        self.period = period
+        self.level = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        if not self.capacity:
+            self._updated = now
+            return
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / self.period)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until ``amount`` can be spent."""
+        self._refill(now)
+        if not self.capacity:
+            return max(0.0, self.blocked_until - now)
+        # A request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        wait = 0.0 if self.level >= amount else (amount - self.level) * self.period / self.capacity
+        return max(wait, self.blocked_until - now)
+
+    def spend(self, amount, now):
+        self._refill(now)
+        if self.capacity:
+            self.level -= amount
+
+    def sync(self, remaining, reset=None, limit=None):
+        """Adopt the budget the API reported in its rate-limit headers.
+
+        With ``limit`` the reported budget is for this bucket's period and
+        replaces it; without, it is for a longer period and can only lower it.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self.level = min(self.capacity, remaining)
+        else:
+            self.level = min(self.level, remaining)
+        if remaining <= 0 and reset:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+
+class GroqScheduler:
+    """Admits model calls in priority order within the request and token budgets.
+
+    Callers ``await acquire(task, tokens)`` before each call. When the budget
+    allows and nobody is queued the call goes straight through; otherwise it
+    waits in a priority queue (interactive endpoints ahead of background
+    video analysis) until the buckets have refilled. The API limits each
+    model separately, so there is one scheduler per model (``scheduler_for``).
+    Budgets are per worker process and re-synchronised from the rate-limit
+    headers of each response, which report the state of the API key across
+    all workers.
+    """
+
+    def __init__(self, model, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.priorities = {
+            task: int(os.getenv(f"GROQ_PRIORITY_{task.upper()}", str(default)))
+            for task, default in DEFAULT_PRIORITIES.items()
+        }
+        self.timeouts = {
+            task: float(os.getenv(f"GROQ_QUEUE_TIMEOUT_{task.upper()}", str(default)))
+            for task, default in DEFAULT_QUEUE_TIMEOUTS.items()
+        }
+        self._queue = []
+        self._order = itertools.count()
+        self._dispatcher = None
+        self._wakeup = None
+
+    def priority(self, task):
+        return self.priorities.get(task, max(DEFAULT_PRIORITIES.values()))
+
+    def timeout(self, task):
+        return self.timeouts.get(task, QUEUE_TIMEOUT)
+
+    def _wait_time(self, tokens, now):
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def _spend(self, tokens, now):
+        self.requests.spend(1, now)
+        self.tokens.spend(tokens, now)
+        GROQ_BUDGET.labels(self.model, "requests").set(self.requests.level)
+        GROQ_BUDGET.labels(self.model, "tokens").set(self.tokens.level)
+
+    def try_acquire(self, task, tokens):
+        """Spend budget for a call only if it is available right now, without queueing."""
+        now = time.monotonic()
+        if self._queue or self._wait_time(tokens, now) > 0:
+            return False
+        self._spend(tokens, now)
+        return True
+
+    async def acquire(self, task, tokens):
+        """Wait until a call to the model estimated at ``tokens`` may be made."""
+        now = time.monotonic()
+        wait = self._wait_time(tokens, now)
+        if not self._queue and wait <= 0:
+            self._spend(tokens, now)
+            GROQ_QUEUE_WAIT.labels(task).observe(0.0)
+            return
+        if wait > self.timeout(task):
+            # Blocked (e.g. until a Retry-After) for longer than the caller would wait
+            raise QueueTimeoutError(task, 0.0, wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (self.priority(task), next(self._order), tokens, task, waiter))
+        GROQ_QUEUE_DEPTH.labels(task).inc()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        else:
+            # A new head of the queue may have a different cost
+            self._wakeup.set()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.timeout(task))
+        except asyncio.TimeoutError:
+            now = time.monotonic()
+            raise QueueTimeoutError(task, now - started, self._wait_time(tokens, now))
+        finally:
+            GROQ_QUEUE_DEPTH.labels(task).dec()
+            GROQ_QUEUE_WAIT.labels(task).observe(time.monotonic() - started)
+
+    async def _dispatch(self):
+        while self._queue:
+            _, _, tokens, task, waiter = self._queue[0]
+            if waiter.done():
+                # The caller went away while queued
+                heapq.heappop(self._queue)
+                continue
+
+            now = time.monotonic()
+            wait = self._wait_time(tokens, now)
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            self._spend(tokens, now)
+            waiter.set_result(None)
+
+    def pause(self, seconds):
+        """Hold every queued call, e.g. after a 429 with Retry-After."""
+        until = time.monotonic() + seconds
+        self.requests.blocked_until = max(self.requests.blocked_until, until)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def update(self, headers):
+        """Sync the budgets from the x-ratelimit-* headers of an API response."""
+        try:
+            remaining = headers.get("x-ratelimit-remaining-requests")
+            if remaining is not None:
+                # The request limit header is per day, the per-minute rate stays configured
+                self.requests.sync(float(remaining), parse_duration(headers.get("x-ratelimit-reset-requests")))
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if remaining is not None:
+                limit = headers.get("x-ratelimit-limit-tokens")
+                self.tokens.sync(
+                    float(remaining),
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                    float(limit) if limit else None,
+                )
+        except ValueError as e:
+            logger.warning(f"Ignoring malformed rate-limit headers: {str(e)}")
+            return
+        GROQ_BUDGET.labels(self.model, "requests").set(self.requests.level)
+        GROQ_BUDGET.labels(self.model, "tokens").set(self.tokens.level)
+
+    def __len__(self):
+        return len(self._queue)
+
+
+_schedulers = {}
+
+
+def scheduler_for(model):
+    """The scheduler holding ``model``'s budget in this process."""
+    scheduler = _schedulers.get(model)
+    if scheduler is None:
+        scheduler = _schedulers[model] = GroqScheduler(model)
+    return scheduler
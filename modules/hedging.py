@@ -0,0 +1,62 @@
+import os
+import logging
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tasks whose model calls are duplicated when they run long; background
+# video analysis is left out, its latency matters less than its budget
+HEDGE_TASKS = {task.strip() for task in os.getenv("GROQ_HEDGE_TASKS", "detect,barcode,aadhar,scan").split(",") if task.strip()}
+# A duplicate is sent once a call has run past this quantile of recent latencies
+HEDGE_QUANTILE = float(os.getenv("GROQ_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge calls faster than this, however low the quantile
+HEDGE_MIN_DELAY = float(os.getenv("GROQ_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_WINDOW = int(os.getenv("GROQ_HEDGE_WINDOW", "200"))
+
+# Per-attempt timeout for each task's model calls (its latency budget)
+DEFAULT_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "20"))
+DEFAULT_TIMEOUTS = {"analyze": 60}
+
+
+class LatencyTracker:
+    """Recent model-call latencies per task, for picking the hedge delay."""
+
+    def __init__(self, window=HEDGE_WINDOW, tasks=HEDGE_TASKS, quantile=HEDGE_QUANTILE,
+                 min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY):
+        self.window = window
+        self.tasks = tasks
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.timeouts = {
+            task: float(os.getenv(f"GROQ_TIMEOUT_{task.upper()}", str(default)))
+            for task, default in DEFAULT_TIMEOUTS.items()
+        }
+        self._samples = {}
+
+    def timeout(self, task):
+        return self.timeouts.get(task, DEFAULT_TIMEOUT)
+
+    def observe(self, task, seconds):
+        samples = self._samples.get(task)
+        if samples is None:
+            samples = self._samples[task] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def hedge_delay(self, task):
+        """Seconds after which a call for ``task`` is duplicated, or None to never hedge."""
+        if task not in self.tasks:
+            return None
+        samples = self._samples.get(task)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        delay = max(self.min_delay, ordered[int(self.quantile * (len(ordered) - 1))])
+        # A hedge fired after the timeout would never get a chance to win
+        return delay if delay < self.timeout(task) else None
+
+
+latency_tracker = LatencyTracker()
@@ -0,0 +1,94 @@
+import os
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from modules.metrics import OUTBOUND_CONNECTIONS, OUTBOUND_REQUESTS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hosts kept in the pool, and kept-alive connections per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Longest silence tolerated between bytes, not a limit on the whole transfer
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_CHUNK_SIZE = int(os.getenv("HTTP_CHUNK_SIZE", str(1024 * 1024)))
+
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+# Counted on connect() rather than when a pool creates a connection object,
+# since pools also reconnect existing objects after the server closed them
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        OUTBOUND_CONNECTIONS.labels("session", "http").inc()
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        OUTBOUND_CONNECTIONS.labels("session", "https").inc()
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and newly opened connections.
+
+    The gap between the two is the number of requests served on a kept-alive
+    connection.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        OUTBOUND_REQUESTS.labels("session", request.method).inc()
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_pid = None
+
+
+def get_http_session():
+    """Return this process's pooled session for outbound fetches, creating it on first use.
+
+    Idempotent requests are retried with exponential backoff on connection
+    errors and on 429/5xx responses, honouring Retry-After. Callers still
+    pass ``timeout=HTTP_TIMEOUT`` since requests has no session-wide timeout.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=HTTP_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        adapter = PooledAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session, _session_pid = session, os.getpid()
+        logger.info(f"Created pooled HTTP session (pid {os.getpid()})")
+    return _session
@@ -0,0 +1,82 @@
+import os
+import base64
+import logging
+from collections import namedtuple
+import cv2
+from modules.metrics import COMPACTION_BYTES, observe_stage
+from modules.cpu_pool import cpu_pool, read_shared_image
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CompactionProfile = namedtuple('CompactionProfile', ['max_side', 'quality'])
+
+# "jpeg" or "webp", both are accepted by the vision models
+COMPACTION_FORMAT = os.getenv("IMAGE_COMPACTION_FORMAT", "jpeg")
+
+# Longest side in pixels and encoder quality per task. Barcodes and Aadhar
+# digits need more detail than the coarse plastic-garbage classification.
+COMPACTION_PROFILES = {
+    "detect": CompactionProfile(max_side=int(os.getenv("DETECT_IMAGE_MAX_SIDE", "768")), quality=80),
+    "barcode": CompactionProfile(max_side=int(os.getenv("BARCODE_IMAGE_MAX_SIDE", "1600")), quality=90),
+    "aadhar": CompactionProfile(max_side=int(os.getenv("AADHAR_IMAGE_MAX_SIDE", "1280")), quality=90),
+}
+DEFAULT_PROFILE = CompactionProfile(max_side=1024, quality=85)
+
+ENCODERS = {
+    "jpeg": ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 'image/jpeg'),
+    "webp": ('.webp', cv2.IMWRITE_WEBP_QUALITY, 'image/webp'),
+}
+
+
+def _record(task, bytes_in, bytes_out):
+    COMPACTION_BYTES.labels(task, "in").inc(bytes_in)
+    COMPACTION_BYTES.labels(task, "out").inc(bytes_out)
+
+
+def _compact_shared_image(shared, task):
+    """CPU pool task: downscale and re-encode a SharedImage, returning its data URL.
+
+    Returns None when the image cannot be decoded or re-encoding would not
+    make it smaller, the caller then sends the original payload.
+    """
+    array = read_shared_image(shared)
+    if array is None:
+        return None
+
+    profile = COMPACTION_PROFILES.get(task, DEFAULT_PROFILE)
+    extension, quality_flag, mime_type = ENCODERS.get(COMPACTION_FORMAT, ENCODERS["jpeg"])
+
+    height, width = array.shape[:2]
+    scale = profile.max_side / max(height, width)
+    if scale < 1:
+        array = cv2.resize(array, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+    ok, encoded = cv2.imencode(extension, array, [quality_flag, profile.quality])
+    if not ok or (scale >= 1 and len(encoded) >= shared.size):
+        # Already small enough, re-encoding would only cost quality
+        _record(task, shared.size, shared.size)
+        return None
+
+    _record(task, shared.size, len(encoded))
+    logger.info(f"Compacted {task} image {width}x{height} from {shared.size} to {len(encoded)} bytes")
+    return f"data:{mime_type};base64,{base64.b64encode(encoded).decode('utf-8')}"
+
+
+async def compact_for_model(image, task):
+    """Downscale and re-encode an ImageInput for a vision-model call, in the CPU pool.
+
+    Returns the data URL to send. URLs are passed through untouched, and the
+    original payload is kept when re-encoding would not make it smaller.
+    """
+    if image.is_url:
+        return image.url
+
+    raw = image.raw
+    if not raw:
+        return image.data_url()
+
+    with observe_stage("compaction"):
+        compacted = await cpu_pool.run_with_image(_compact_shared_image, raw, task)
+    return compacted or image.data_url()
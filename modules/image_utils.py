@@ -0,0 +1,124 @@
+import base64
+import binascii
+from modules.metrics import observe_stage
+
+# Leading magic bytes of the formats clients send us
+MAGIC_MIME_TYPES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+
+def is_url(image_data):
+    """Check if the image payload is a remote URL rather than inline data."""
+    return image_data.startswith(('http://', 'https://'))
+
+
+def strip_data_url(image_data):
+    """Remove a ``data:...;base64,`` header if present."""
+    if 'base64,' in image_data:
+        return image_data.split('base64,', 1)[1]
+    return image_data
+
+
+def guess_mime_type(image_bytes, default='image/png'):
+    """Sniff the image MIME type from its leading bytes."""
+    head = bytes(image_bytes[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mime_type in MAGIC_MIME_TYPES:
+        if head.startswith(magic):
+            return mime_type
+    return default
+
+
+class ImageInput:
+    """An image payload independent of how it was uploaded.
+
+    Wraps a remote URL, a base64 string from the JSON API or the raw bytes of a
+    multipart / ``application/octet-stream`` upload. The bytes are decoded at
+    most once and shared by the cache, the local pipelines and the model call.
+    """
+
+    def __init__(self, url=None, base64_data=None, raw=None):
+        self.url = url
+        self._base64 = base64_data
+        self._raw = raw
+        self._array = None
+
+    @classmethod
+    def from_string(cls, image_data):
+        """Build from the ``image`` field of the JSON API (URL or base64)."""
+        if image_data and is_url(image_data):
+            return cls(url=image_data)
+        return cls(base64_data=strip_data_url(image_data or ''))
+
+    @classmethod
+    def from_bytes(cls, image_bytes):
+        """Build from raw uploaded bytes."""
+        return cls(raw=image_bytes)
+
+    @classmethod
+    def coerce(cls, image):
+        """Accept either an ImageInput or a legacy URL/base64 string."""
+        return image if isinstance(image, cls) else cls.from_string(image)
+
+    @property
+    def is_url(self):
+        return self.url is not None
+
+    @property
+    def is_empty(self):
+        return not (self.url or self._base64 or self._raw)
+
+    @property
+    def raw(self):
+        """Raw image bytes, or None for URLs and undecodable base64."""
+        if self._raw is None and self._base64:
+            try:
+                with observe_stage("base64_decode"):
+                    self._raw = base64.b64decode(self._base64)
+            except (binascii.Error, ValueError):
+                return None
+        return self._raw
+
+    @property
+    def size(self):
+        """Size of the payload in bytes as received."""
+        if self.url is not None:
+            return len(self.url)
+        if self._base64 is not None:
+            return len(self._base64)
+        return len(self._raw or b'')
+
+    def to_array(self):
+        """Decode to an OpenCV BGR image (cached), or None if undecodable."""
+        if self._array is None:
+            raw = self.raw
+            if not raw:
+                return None
+            # Imported here so that reading a request does not pull in OpenCV
+            import cv2
+            import numpy as np
+            with observe_stage("image_decode"):
+                self._array = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+        return self._array
+
+    @property
+    def mime_type(self):
+        raw = self.raw
+        return guess_mime_type(raw) if raw else 'image/png'
+
+    def data_url(self):
+        """URL to send to the vision model, reusing the client's base64 text."""
+        if self.url is not None:
+            return self.url
+        encoded = self._base64 or base64.b64encode(self.raw).decode('utf-8')
+        return f"data:{self.mime_type};base64,{encoded}"
+
+    def __repr__(self):
+        kind = 'url' if self.url is not None else 'base64' if self._base64 is not None else 'bytes'
+        return f"ImageInput({kind}, {self.size} bytes)"
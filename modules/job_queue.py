@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import tempfile
+import threading
+from modules.http_client import HTTP_CONNECT_TIMEOUT, get_http_session
+from modules.metrics import record_error
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv(
+    "ANALYZE_JOB_DB", os.path.join(tempfile.gettempdir(), "check-octo-jobs.sqlite3")
+)
+# Concurrent analyses per gunicorn worker
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "2"))
+# Reject new jobs once this many are waiting across all workers
+ANALYZE_MAX_QUEUED = int(os.getenv("ANALYZE_MAX_QUEUED", "1000"))
+# A running job whose lease expires (worker killed) is picked up again
+JOB_LEASE_SECONDS = float(os.getenv("ANALYZE_JOB_LEASE", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("ANALYZE_JOB_MAX_ATTEMPTS", "3"))
+# A transiently failed job waits this long before its second attempt, doubling
+# after each further failure, or longer if the error says when to retry
+JOB_RETRY_BACKOFF = float(os.getenv("ANALYZE_JOB_RETRY_BACKOFF", "5"))
+# Finished jobs are kept this long for polling
+JOB_RETENTION_SECONDS = float(os.getenv("ANALYZE_JOB_RETENTION", str(24 * 3600)))
+# Idle workers poll the store every POLL_INTERVAL, doubling up to MAX_POLL_INTERVAL
+# while nothing turns up; local submits wake them right away
+POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = float(os.getenv("ANALYZE_MAX_POLL_INTERVAL", "5"))
+CALLBACK_TIMEOUT = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    video_url TEXT NOT NULL,
+    callback_url TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    not_before REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobStore:
+    """Persistent /analyze job table shared by all workers on the host.
+
+    Jobs are claimed with a lease so that a job held by a worker that was
+    recycled (``max_requests``) or killed is retried by another worker.
+    """
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        """Return a connection owned by the current process and thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "not_before" not in columns:
+            # A job table created before retries were delayed
+            try:
+                conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+            except sqlite3.OperationalError:
+                # Another worker added it first
+                pass
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, video_url, callback_url=None):
+        """Queue a new job and return its id."""
+        conn = self._connect()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= ANALYZE_MAX_QUEUED:
+            raise QueueFullError(f"{queued} analysis jobs already queued")
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (id, video_url, callback_url, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, video_url, callback_url, time.time()),
+        )
+        return job_id
+
+    def get(self, job_id):
+        """Return the public view of a job, or None."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "video_url": row["video_url"],
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def claim(self, owner):
+        """Atomically take the oldest runnable job, or return None.
+
+        A requeued job is only runnable once its ``not_before`` has passed.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, video_url, callback_url, attempts FROM jobs "
+                "WHERE (status = 'queued' AND (not_before IS NULL OR not_before <= ?)) "
+                "OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            if row["attempts"] >= JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    ("Job abandoned after repeated worker failures", now, row["id"]),
+                )
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, "
+                "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (owner, now + JOB_LEASE_SECONDS, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            return dict(row)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def finish(self, job_id, result=None, error=None):
+        """Record the outcome of a job."""
+        status = 'failed' if error is not None else 'done'
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE id = ?",
+            (status, json.dumps(result) if error is None else None, error, time.time(), job_id),
+        )
+
+    def requeue(self, job_id, error, delay=0.0):
+        """Put a job that failed transiently back in the queue, runnable again after ``delay`` seconds."""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, error = ?, not_before = ? "
+            "WHERE id = ?",
+            (error, time.time() + delay, job_id),
+        )
+
+    def release(self, owner):
+        """Put jobs held by ``owner`` back in the queue (graceful shutdown)."""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, "
+            "attempts = MAX(attempts - 1, 0) WHERE status = 'running' AND owner = ?",
+            (owner,),
+        )
+
+    def purge(self):
+        """Drop finished jobs older than the retention period."""
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - JOB_RETENTION_SECONDS,),
+        )
+
+
+class JobWorkerPool:
+    """Bounded pool of asyncio workers that run queued /analyze jobs.
+
+    Each gunicorn worker runs ``size`` job loops. The blocking video stage
+    is left to the handler, which runs it in the video pool, and the SQLite
+    store is used from a thread. Jobs failing with one of ``retry_on`` are
+    queued again until they run out of attempts, each time after a growing
+    backoff or the seconds ``retry_after(error)`` asks for, whichever is longer.
+    """
+
+    def __init__(self, store, handler, size=ANALYZE_WORKERS, retry_on=(), retry_after=None):
+        self.store = store
+        self.handler = handler
+        self.size = size
+        self.retry_on = retry_on
+        self.retry_after = retry_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._wakeup = None
+
+    def start(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        self.store.purge()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.size)]
+        logger.info(f"Started {self.size} analysis workers ({self.owner})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Let another worker pick up whatever we were in the middle of
+        await asyncio.to_thread(self.store.release, self.owner)
+
+    def notify(self):
+        """Wake idle workers after a local submit instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        interval = POLL_INTERVAL
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.owner)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+                    interval = POLL_INTERVAL
+                except asyncio.TimeoutError:
+                    interval = min(interval * 2, MAX_POLL_INTERVAL)
+                continue
+            interval = POLL_INTERVAL
+            await self._process(job)
+
+    async def _process(self, job):
+        job_id = job["id"]
+        logger.info(f"Running analysis job {job_id}")
+        try:
+            result = await self.handler(job["video_url"])
+            await asyncio.to_thread(self.store.finish, job_id, result=result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record_error("analyze", e)
+            # ``attempts`` was read before this run was counted
+            if isinstance(e, self.retry_on) and job["attempts"] + 1 < JOB_MAX_ATTEMPTS:
+                delay = self._retry_delay(e, job["attempts"])
+                logger.warning(f"Analysis job {job_id} failed transiently, retrying in {delay:.0f}s: {str(e)}")
+                await asyncio.to_thread(self.store.requeue, job_id, str(e), delay)
+                return
+            logger.error(f"Analysis job {job_id} failed: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self.store.finish, job_id, error=str(e))
+
+        if job["callback_url"]:
+            await self._send_callback(job["callback_url"], await asyncio.to_thread(self.store.get, job_id))
+
+    def _retry_delay(self, error, attempts):
+        """Seconds before the next try of a job that failed transiently after ``attempts`` earlier runs"""
+        delay = JOB_RETRY_BACKOFF * 2 ** attempts
+        wait = self.retry_after(error) if self.retry_after is not None else None
+        return max(delay, wait or 0.0)
+
+    async def _send_callback(self, callback_url, payload):
+        try:
+            # The process-wide pooled session, so callbacks to the same host reuse connections
+            response = await asyncio.to_thread(
+                get_http_session().post, callback_url, json=payload, timeout=(HTTP_CONNECT_TIMEOUT, CALLBACK_TIMEOUT)
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Callback to {callback_url} failed: {str(e)}")
@@ -0,0 +1,251 @@
+import os
+import time
+import atexit
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a shared
+# directory before any worker starts, so every worker writes its samples there
+# and /metrics aggregates them regardless of which worker serves the scrape.
+# Without it (plain uvicorn, python app.py) a private directory is made here,
+# before prometheus_client is imported, so the spawned CPU and video pool
+# processes inherit it and their stage timings reach /metrics as well.
+_private_dir = None
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    _private_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="check-octo-metrics-")
+
+
+def remove_private_metrics_dir():
+    """Delete the directory made above, if this process made one."""
+    if _private_dir:
+        shutil.rmtree(_private_dir, ignore_errors=True)
+
+
+# uvicorn re-raises SIGTERM after shutdown, which skips this; the app's lifespan calls it too
+atexit.register(remove_private_metrics_dir)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(2 ** power for power in range(10, 26))
+
+STAGE_SECONDS = Histogram(
+    "check_octo_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+GROQ_SECONDS = Histogram(
+    "check_octo_groq_request_seconds",
+    "Groq chat completion round-trip time",
+    ["task"],
+    buckets=STAGE_BUCKETS,
+)
+GROQ_REQUESTS = Counter(
+    "check_octo_groq_requests_total",
+    "Groq chat completions by task and outcome",
+    ["task", "outcome"],
+)
+GROQ_RETRIED = Counter(
+    "check_octo_groq_retries_total",
+    "Groq calls retried after a rate limit, server or connection error",
+    ["task", "reason"],
+)
+GROQ_QUEUE_DEPTH = Gauge(
+    "check_octo_groq_queue_depth",
+    "Model calls waiting for rate-limit budget",
+    ["task"],
+    multiprocess_mode="livesum",
+)
+GROQ_QUEUE_WAIT = Histogram(
+    "check_octo_groq_queue_wait_seconds",
+    "Time model calls waited for rate-limit budget",
+    ["task"],
+    buckets=STAGE_BUCKETS,
+)
+GROQ_BUDGET = Gauge(
+    "check_octo_groq_budget",
+    "Rate-limit budget left per model in each worker's view (requests, tokens)",
+    ["model", "kind"],
+    multiprocess_mode="liveall",
+)
+HEDGED_REQUESTS = Counter(
+    "check_octo_groq_hedged_requests_total",
+    "Duplicate model calls sent after the first ran past the task's latency quantile, "
+    "and how many of them answered first",
+    ["task", "outcome"],
+)
+BREAKER_STATE = Gauge(
+    "check_octo_circuit_state",
+    "Model API circuit breaker state per model (0 closed, 1 half open, 2 open)",
+    ["model"],
+    multiprocess_mode="livemax",
+)
+BREAKER_TRANSITIONS = Counter(
+    "check_octo_circuit_transitions_total",
+    "Circuit breaker state changes per model",
+    ["model", "state"],
+)
+REQUEST_SECONDS = Histogram(
+    "check_octo_request_seconds",
+    "HTTP request latency",
+    ["endpoint", "method"],
+    buckets=STAGE_BUCKETS,
+)
+REQUESTS = Counter(
+    "check_octo_requests_total",
+    "HTTP requests by endpoint and status code",
+    ["endpoint", "method", "status"],
+)
+IN_FLIGHT = Gauge(
+    "check_octo_in_flight_requests",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+ERRORS = Counter(
+    "check_octo_errors_total",
+    "Errors by endpoint and exception type",
+    ["endpoint", "type"],
+)
+PAYLOAD_BYTES = Histogram(
+    "check_octo_payload_bytes",
+    "Size of uploaded image payloads as received",
+    ["endpoint"],
+    buckets=SIZE_BUCKETS,
+)
+AADHAR_RESULTS = Counter(
+    "check_octo_aadhar_results_total",
+    "Aadhar extractions by the path that produced the result (ocr, ocr_only, groq, url, none)",
+    ["path"],
+)
+AADHAR_OCR = Counter(
+    "check_octo_aadhar_ocr_total",
+    "Local Aadhar OCR by outcome: accepted from the first variant (primary), by vote across "
+    "variants (ensemble) or by per-digit vote (fused), else sent to the model (fallback) or "
+    "given up with the model unavailable (failed)",
+    ["outcome"],
+)
+SCAN_TASKS = Counter(
+    "check_octo_scan_tasks_total",
+    "Tasks answered by /scan, by task and whether the local stage or the shared model call answered",
+    ["task", "source"],
+)
+BARCODE_RESULTS = Counter(
+    "check_octo_barcode_results_total",
+    "Barcode scans by the path that produced the result (local, groq)",
+    ["source"],
+)
+COALESCED_REQUESTS = Counter(
+    "check_octo_coalesced_requests_total",
+    "Requests served by an identical computation already in flight",
+    ["endpoint"],
+)
+BOOT_SECONDS = Gauge(
+    "check_octo_boot_seconds",
+    "Worker boot time by phase (import, processors, startup)",
+    ["phase"],
+    multiprocess_mode="liveall",
+)
+# client is "session" for the pooled requests session (video downloads and
+# probes, callbacks) or "ffmpeg" for streamed video, which FFmpeg fetches on
+# a connection of its own per capture
+OUTBOUND_REQUESTS = Counter(
+    "check_octo_outbound_requests_total",
+    "Outbound HTTP requests by client",
+    ["client", "method"],
+)
+OUTBOUND_CONNECTIONS = Counter(
+    "check_octo_outbound_connections_total",
+    "New outbound HTTP connections opened; requests minus connections were reused",
+    ["client", "scheme"],
+)
+VIDEO_CACHE_LOOKUPS = Counter(
+    "check_octo_video_cache_lookups_total",
+    "Video cache outcomes (hit, keyframes, stale, miss)",
+    ["outcome"],
+)
+MODEL_ROUTING = Counter(
+    "check_octo_model_routing_total",
+    "Routing decisions per task: small model accepted, escalated on low confidence, "
+    "escalated after a small-model error, or sent directly when routing is off",
+    ["task", "decision"],
+)
+MODEL_TIER_SECONDS = Histogram(
+    "check_octo_model_tier_seconds",
+    "Model call latency per task and tier (small, large)",
+    ["task", "tier"],
+    buckets=STAGE_BUCKETS,
+)
+ROUTING_THRESHOLD = Gauge(
+    "check_octo_routing_threshold_percent",
+    "Confidence below which a task escalates to the large model",
+    ["task"],
+    multiprocess_mode="livemax",
+)
+DETECT_DECISIONS = Counter(
+    "check_octo_detect_decisions_total",
+    "/detect answers by the backend that produced them; local answers are remote calls avoided",
+    ["backend"],
+)
+COMPACTION_BYTES = Counter(
+    "check_octo_compaction_bytes_total",
+    "Image bytes before (in) and after (out) compaction, per task",
+    ["task", "direction"],
+)
+
+
+@contextmanager
+def observe_stage(stage):
+    """Time the enclosed block into the stage histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_error(endpoint, error):
+    ERRORS.labels(endpoint, type(error).__name__).inc()
+
+
+class ResultCacheCollector:
+    """Expose the SQLite result cache counters, which are already host-wide."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        if not stats.get("enabled") or "error" in stats:
+            return
+        lookups = CounterMetricFamily(
+            "check_octo_result_cache_lookups",
+            "Result cache lookups by endpoint and outcome",
+            labels=["endpoint", "outcome"],
+        )
+        for endpoint, counts in stats["endpoints"].items():
+            lookups.add_metric([endpoint, "hit"], counts["hits"])
+            lookups.add_metric([endpoint, "miss"], counts["misses"])
+        yield lookups
+        yield GaugeMetricFamily("check_octo_result_cache_entries", "Entries in the result cache", value=stats["entries"])
+        yield GaugeMetricFamily("check_octo_result_cache_bytes", "Bytes stored in the result cache", value=stats["bytes"])
+
+
+def render_metrics(extra_collectors=()):
+    """Return (body, content type) for the /metrics endpoint."""
+    registry = CollectorRegistry()
+    # Samples from this process, the other workers and every pool process
+    multiprocess.MultiProcessCollector(registry)
+    for collector in extra_collectors:
+        registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,102 @@
+import os
+import re
+import time
+import logging
+from modules.groq_client import create_chat_completion
+from modules.circuit_breaker import breaker_for
+from modules.metrics import MODEL_ROUTING, MODEL_TIER_SECONDS, ROUTING_THRESHOLD
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SMALL_MODEL = os.getenv("GROQ_SMALL_MODEL", "llama-3.2-11b-vision-preview")
+LARGE_MODEL = os.getenv("GROQ_LARGE_MODEL", "llama-3.2-90b-vision-preview")
+# Set to 0 to send everything straight to the large model
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "1") != "0"
+
+# Minimum confidence (percent) at which the small model's answer is kept,
+# overridable per task with e.g. ROUTING_THRESHOLD_DETECT=85
+DEFAULT_THRESHOLDS = {"detect": 80, "aadhar": 90, "barcode": 90}
+
+CONFIDENCE_PATTERN = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%')
+
+
+def parse_confidence(text):
+    """Split a model answer into (answer, confidence percentage or None).
+
+    The confidence is the last percentage in the text; the answer is the text
+    with it removed.
+    """
+    matches = list(CONFIDENCE_PATTERN.finditer(text))
+    if not matches:
+        return text.strip(), None
+    last = matches[-1]
+    answer = (text[:last.start()] + text[last.end():]).strip().rstrip(',;:-').strip()
+    return answer, min(100.0, float(last.group(1)))
+
+
+class ModelRouter:
+    """Send a completion to the small model first, escalating on low confidence.
+
+    ``parse`` turns the model's text into ``(result, confidence)``, with the
+    confidence in percent or None when the answer did not state one. Answers
+    below the task's threshold, without a confidence, or a failed small-model
+    call are retried on the large model, whose answer is kept as is.
+    """
+
+    def __init__(self, small_model=SMALL_MODEL, large_model=LARGE_MODEL, enabled=ROUTING_ENABLED):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.enabled = enabled
+        self.thresholds = {
+            task: float(os.getenv(f"ROUTING_THRESHOLD_{task.upper()}", str(default)))
+            for task, default in DEFAULT_THRESHOLDS.items()
+        }
+        for task, threshold in self.thresholds.items():
+            ROUTING_THRESHOLD.labels(task).set(threshold)
+
+    def threshold(self, task):
+        return self.thresholds.get(task, 100.0)
+
+    def available(self):
+        """Whether any model the router would call is accepting calls (circuit not open)."""
+        models = (self.small_model, self.large_model) if self.enabled else (self.large_model,)
+        return any(not breaker_for(model).rejecting() for model in models)
+
+    def version(self, task):
+        """Routing configuration for ``task``, part of the result cache version."""
+        if not self.enabled:
+            return self.large_model
+        return f"{self.small_model}>{self.large_model}@{self.threshold(task):g}"
+
+    async def _complete(self, task, tier, model, **kwargs):
+        started = time.perf_counter()
+        try:
+            completion = await create_chat_completion(task, model=model, **kwargs)
+        finally:
+            MODEL_TIER_SECONDS.labels(task, tier).observe(time.perf_counter() - started)
+        return completion.choices[0].message.content
+
+    async def complete(self, task, parse, **kwargs):
+        """Return the parsed result of the cheapest tier that is confident enough."""
+        if self.enabled:
+            try:
+                result, confidence = parse(await self._complete(task, "small", self.small_model, **kwargs))
+            except Exception as e:
+                logger.error(f"Small model failed for {task}, escalating: {str(e)}")
+                MODEL_ROUTING.labels(task, "error").inc()
+            else:
+                if confidence is not None and confidence >= self.threshold(task):
+                    MODEL_ROUTING.labels(task, "accepted").inc()
+                    return result
+                logger.info(f"Escalating {task} to {self.large_model} (confidence {confidence})")
+                MODEL_ROUTING.labels(task, "escalated").inc()
+        else:
+            MODEL_ROUTING.labels(task, "direct").inc()
+
+        result, _ = parse(await self._complete(task, "large", self.large_model, **kwargs))
+        return result
+
+
+model_router = ModelRouter()
@@ -0,0 +1,49 @@
+import time
+import logging
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ProcessorRegistry:
+    """Named processors that are imported and built on first use.
+
+    Loaders do their own imports, so OpenCV, tesseract, PIL and friends are
+    only paid for by a worker once an endpoint needs them. ``load_all`` pulls
+    everything in up front, which is what the gunicorn master does in preload
+    mode so workers inherit the loaded modules copy-on-write.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._processors = {}
+        self._load_seconds = {}
+        # Reentrant, a loader may get the processors it builds on
+        self._lock = threading.RLock()
+
+    def register(self, name, loader):
+        """Register a zero-argument callable that imports and returns the processor."""
+        self._loaders[name] = loader
+
+    def get(self, name):
+        processor = self._processors.get(name)
+        if processor is not None:
+            return processor
+
+        with self._lock:
+            if name not in self._processors:
+                started = time.perf_counter()
+                self._processors[name] = self._loaders[name]()
+                self._load_seconds[name] = time.perf_counter() - started
+                logger.info(f"Loaded '{name}' processor in {self._load_seconds[name]:.3f}s")
+            return self._processors[name]
+
+    def load_all(self):
+        for name in self._loaders:
+            self.get(name)
+
+    def load_seconds(self):
+        """Load time of each processor loaded so far."""
+        return dict(self._load_seconds)
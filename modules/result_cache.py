@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "check-octo-results.sqlite3")
+)
+CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Run the (comparatively expensive) size check once every N writes per process
+EVICT_EVERY = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+CREATE TABLE IF NOT EXISTS stats (
+    endpoint TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def prompt_version(*parts):
+    """Short fingerprint of the model/prompt used to produce a cached result."""
+    return hashlib.sha256("\x00".join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+class ResultCache:
+    """Content-addressed result cache shared by all workers on the host.
+
+    Entries live in a SQLite database (WAL mode) so every gunicorn worker reads
+    and writes the same store. Eviction is by TTL on creation time and LRU on
+    last access once the stored values exceed ``max_bytes``. Calls block on
+    the database, async callers run them in a thread.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, enabled=CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        """Return a connection owned by the current process and thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, endpoint, image_bytes, version):
+        """Build the cache key from the decoded image bytes, endpoint and version."""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{endpoint}:{version}:{digest}"
+
+    def _count(self, conn, endpoint, column):
+        conn.execute(
+            f"INSERT INTO stats (endpoint, {column}) VALUES (?, 1) "
+            f"ON CONFLICT(endpoint) DO UPDATE SET {column} = {column} + 1",
+            (endpoint,),
+        )
+
+    def get(self, endpoint, key):
+        """Return the cached value for ``key`` or None, recording a hit or miss."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM results WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self._count(conn, endpoint, 'misses')
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._count(conn, endpoint, 'hits')
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.error(f"Result cache read failed: {str(e)}")
+            return None
+
+    def set(self, endpoint, key, value):
+        """Store a JSON-serialisable result under ``key``."""
+        if not self.enabled:
+            return
+        try:
+            conn = self._connect()
+            payload = json.dumps(value)
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, endpoint, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, payload, len(payload), now, now),
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.error(f"Result cache write failed: {str(e)}")
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones above the byte cap."""
+        conn.execute("DELETE FROM results WHERE created_at <= ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", stale_keys)
+        logger.info(f"Result cache evicted {len(stale_keys)} entries ({freed} bytes)")
+
+    def stats(self):
+        """Return hit/miss counters per endpoint plus current size."""
+        if not self.enabled:
+            return {"enabled": False}
+        try:
+            conn = self._connect()
+            endpoints = {
+                endpoint: {"hits": hits, "misses": misses}
+                for endpoint, hits, misses in conn.execute("SELECT endpoint, hits, misses FROM stats")
+            }
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Result cache stats failed: {str(e)}")
+            return {"enabled": True, "error": str(e)}
+        return {
+            "enabled": True,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "endpoints": endpoints,
+        }
+
+result_cache = ResultCache()
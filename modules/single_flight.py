@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from modules.metrics import COALESCED_REQUESTS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Share one in-progress computation between concurrent identical calls.
+
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs await the same task instead of repeating the work.
+    Waiters are shielded, so a caller that goes away does not cancel the
+    computation for the others. Coalescing is per worker process.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, endpoint, key, compute):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED_REQUESTS.labels(endpoint).inc()
+            logger.info(f"Coalesced {endpoint} request with one already in flight")
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+single_flight = SingleFlight()
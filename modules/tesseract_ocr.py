@@ -0,0 +1,156 @@
+import os
+import glob
+import logging
+import threading
+import numpy as np
+import pytesseract
+from modules.metrics import observe_stage
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Directory holding *.traineddata, found with tessdata_path() when unset
+TESSDATA_PATH = os.getenv("TESSDATA_PREFIX")
+DIGIT_WHITELIST = '0123456789'
+# Where distribution packages install the language data
+TESSDATA_CANDIDATES = ('/usr/share/tesseract-ocr/*/tessdata', '/usr/share/tessdata', '/usr/local/share/tessdata')
+
+
+def tessdata_path(lang='eng'):
+    """Directory with ``lang``'s traineddata for tesserocr, or None.
+
+    A tesserocr wheel looks in "./" by default rather than where the
+    system's tesseract keeps its data, so the usual locations are searched.
+    """
+    if TESSDATA_PATH:
+        return TESSDATA_PATH
+    path, languages = tesserocr.get_languages()
+    if lang in languages:
+        return path
+    for pattern in TESSDATA_CANDIDATES:
+        for candidate in sorted(glob.glob(pattern), reverse=True):
+            if os.path.isfile(os.path.join(candidate, f'{lang}.traineddata')):
+                return candidate
+    return None
+
+
+class TesseractOCR:
+    """Tesseract wrapper that keeps the engine loaded between calls.
+
+    With ``tesserocr`` installed, each thread owns a persistent
+    ``PyTessBaseAPI`` handle so the language model is loaded once per worker
+    thread instead of once per request. Without it (or if the handle cannot be
+    initialised) calls fall back to the ``pytesseract`` subprocess.
+    """
+
+    def __init__(self, lang='eng', psm=7, whitelist=DIGIT_WHITELIST):
+        self.lang = lang
+        self.psm = psm
+        self.whitelist = whitelist
+        self._local = threading.local()
+        self._in_process = tesserocr is not None
+        self._path = None
+        if self._in_process:
+            self._path = tessdata_path(lang)
+            if self._path is None:
+                logger.warning(
+                    f"No tessdata directory with '{lang}' found for in-process tesseract, "
+                    f"using the slower subprocess; set TESSDATA_PREFIX to fix"
+                )
+                self._in_process = False
+
+    def _api(self):
+        """Return this thread's tesseract handle, creating it on first use"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(path=self._path, lang=self.lang, psm=self.psm)
+            if self.whitelist:
+                api.SetVariable('tessedit_char_whitelist', self.whitelist)
+            self._local.api = api
+        return api
+
+    @property
+    def in_process(self):
+        return self._in_process
+
+    def image_to_string(self, image):
+        """Recognise text in a grayscale or BGR uint8 image"""
+        with observe_stage("ocr"):
+            return self._image_to_string(image)
+
+    def image_to_symbols(self, image):
+        """Recognise text as (character, confidence 0-100) pairs, with a space between words"""
+        with observe_stage("ocr"):
+            return self._image_to_symbols(image)
+
+    def _image_to_symbols(self, image):
+        if self._in_process:
+            try:
+                api = self._api()
+            except RuntimeError as e:
+                logger.error(f"In-process tesseract unavailable, using subprocess: {str(e)}")
+                self._in_process = False
+            else:
+                self._set_image(api, image)
+                api.Recognize()
+                iterator = api.GetIterator()
+                symbols = []
+                if iterator is None:
+                    return symbols
+                for result in tesserocr.iterate_level(iterator, tesserocr.RIL.SYMBOL):
+                    try:
+                        text = result.GetUTF8Text(tesserocr.RIL.SYMBOL)
+                    except RuntimeError:
+                        # Raised instead of returning an empty string, e.g. for a blank image
+                        continue
+                    if not text:
+                        continue
+                    if symbols and result.IsAtBeginningOf(tesserocr.RIL.WORD):
+                        symbols.append((' ', 100.0))
+                    symbols.append((text, result.Confidence(tesserocr.RIL.SYMBOL)))
+                return symbols
+
+        # The subprocess only reports confidences per word
+        data = pytesseract.image_to_data(
+            image, lang=self.lang, config=self._config(), output_type=pytesseract.Output.DICT
+        )
+        symbols = []
+        for text, confidence in zip(data['text'], data['conf']):
+            text = text.strip()
+            if not text or float(confidence) < 0:
+                continue
+            if symbols:
+                symbols.append((' ', 100.0))
+            symbols.extend((character, float(confidence)) for character in text)
+        return symbols
+
+    def _set_image(self, api, image):
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+
+    def _config(self):
+        config = f'--psm {self.psm}'
+        if self.whitelist:
+            config += f' -c tessedit_char_whitelist={self.whitelist}'
+        return config
+
+    def _image_to_string(self, image):
+        if self._in_process:
+            try:
+                api = self._api()
+            except RuntimeError as e:
+                logger.error(f"In-process tesseract unavailable, using subprocess: {str(e)}")
+                self._in_process = False
+            else:
+                self._set_image(api, image)
+                return api.GetUTF8Text()
+
+        return pytesseract.image_to_string(image, lang=self.lang, config=self._config())
@@ -0,0 +1,187 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VIDEO_CACHE_ENABLED = os.getenv("VIDEO_CACHE_ENABLED", "1") != "0"
+VIDEO_CACHE_DIR = os.getenv(
+    "VIDEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "check-octo-videos")
+)
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    frames_version TEXT,
+    composite_version TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_last_access ON videos (last_access);
+"""
+
+
+class VideoCache:
+    """Keyframes and composites of analysed videos, shared by all workers on the host.
+
+    Entries are keyed by URL and remember the ETag/Last-Modified the origin
+    sent, so a repeat analysis only needs a conditional GET: a 304 means the
+    stored composite (or the keyframes to rebuild it) can be used without
+    downloading or decoding anything. Files live in ``directory`` with a SQLite
+    index; the least recently used entries are dropped beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory=VIDEO_CACHE_DIR, max_bytes=VIDEO_CACHE_MAX_BYTES, enabled=VIDEO_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+
+    def _connect(self):
+        """Return a connection owned by the current process and thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=5.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _path(self, url, suffix):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    def _write(self, path, write):
+        # Write then rename, readers in other workers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            write(handle)
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+
+    def lookup(self, url):
+        """Return the cached validators for ``url``, or None."""
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT etag, last_modified, frames_version, composite_version FROM videos WHERE url = ?",
+                (url,),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Video cache lookup failed: {str(e)}")
+            return None
+        return dict(row) if row is not None else None
+
+    def conditional_headers(self, entry):
+        """Request headers that turn a GET into a revalidation of ``entry``."""
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _touch(self, url):
+        self._connect().execute("UPDATE videos SET last_access = ? WHERE url = ?", (time.time(), url))
+
+    def load_composite(self, url, version):
+        """Return the stored JPEG composite built with ``version``, or None."""
+        entry = self.lookup(url)
+        if entry is None or entry["composite_version"] != version:
+            return None
+        try:
+            with open(self._path(url, "jpg"), 'rb') as handle:
+                composite = handle.read()
+        except OSError:
+            return None
+        self._touch(url)
+        return composite
+
+    def load_keyframes(self, url, version):
+        """Return the stored (timestamp, image) keyframes extracted with ``version``, or None."""
+        entry = self.lookup(url)
+        if entry is None or entry["frames_version"] != version:
+            return None
+        try:
+            with np.load(self._path(url, "npz")) as data:
+                keyframes = list(zip(data["timestamps"].tolist(), data["images"]))
+        except (OSError, ValueError, KeyError):
+            return None
+        self._touch(url)
+        return keyframes
+
+    def store(self, url, etag, last_modified, frames_version, keyframes, composite_version, composite):
+        """Store the keyframes and composite of a freshly analysed video."""
+        if not self.enabled or not (etag or last_modified):
+            # Without a validator there is no way to tell when the entry goes stale
+            return
+        try:
+            conn = self._connect()
+            size = self._write(
+                self._path(url, "npz"),
+                lambda handle: np.savez(
+                    handle,
+                    timestamps=np.array([timestamp for timestamp, _ in keyframes], dtype=np.float64),
+                    images=np.stack([image for _, image in keyframes]),
+                ),
+            )
+            size += self._write(self._path(url, "jpg"), lambda handle: handle.write(composite))
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (url, etag, last_modified, frames_version, composite_version, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, frames_version, composite_version, size, time.time()),
+            )
+            self._evict(conn)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Video cache write failed: {str(e)}")
+
+    def store_composite(self, url, version, composite):
+        """Replace the composite of an entry, e.g. after the grid layout changed."""
+        if not self.enabled:
+            return
+        try:
+            conn = self._connect()
+            frames_size = os.path.getsize(self._path(url, "npz"))
+            size = self._write(self._path(url, "jpg"), lambda handle: handle.write(composite))
+            conn.execute(
+                "UPDATE videos SET composite_version = ?, size = ?, last_access = ? WHERE url = ?",
+                (version, frames_size + size, time.time(), url),
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Video cache write failed: {str(e)}")
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the quota is respected."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM videos").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in conn.execute("SELECT url, size FROM videos ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM videos WHERE url = ?", (row["url"],))
+            for suffix in ("npz", "jpg"):
+                try:
+                    os.unlink(self._path(row["url"], suffix))
+                except FileNotFoundError:
+                    pass
+            total -= row["size"]
+            logger.info(f"Evicted cached video {row['url']}")
+
+
+video_cache = VideoCache()
@@ -1,32 +1,34 @@
-import os
-import base64
 # import requests
-from groq import Groq
+from modules.model_router import model_router, parse_confidence
+from modules.image_utils import ImageInput
+from modules.image_compaction import compact_for_model
+from modules.detect_backends import build_detect_backends
 
-# Access the environment variable
-api_key = os.environ.get('GROQ_API_KEY')
+PROMPT = "Is this image showing plastic garbage? Respond only with 'YES' or 'NO' followed by a confidence percentage."
 
-def is_plastic_garbage(image_data):
-    # Initialize Groq client
-    client = Groq(api_key=api_key)
+def parse_answer(text):
+    """Return (is plastic, confidence) from a 'YES 91%' style answer"""
+    answer, confidence = parse_confidence(text.lower())
+    words = answer.split()
+    if not words:
+        return False, None
+    return "yes" in words[0], confidence
 
-    # Determine if input is base64 or URL
-    if image_data.startswith(('http://', 'https://')):
-        # Handle URL case
-        image_content = image_data
-    else:
-        # Handle base64 case - assume it's a PNG image
-        image_content = f"data:image/png;base64,{image_data}"
+async def ask_model(image_input):
+    # URL, base64 or raw upload, downscaled and re-encoded for the model
+    image_content = await compact_for_model(image_input, "detect")
 
-    # Rest of the function remains the same
-    chat_completion = client.chat.completions.create(
+    # Small model first, the large one only when it is unsure
+    return await model_router.complete(
+        "detect",
+        parse_answer,
         messages=[
             {
                 "role": "user",
                 "content": [
                     {
                         "type": "text",
-                        "text": "Is this image showing plastic garbage? Respond only with 'YES' or 'NO' followed by a confidence percentage."
+                        "text": PROMPT
                     },
                     {
                         "type": "image_url",
@@ -35,11 +37,12 @@ def is_plastic_garbage(image_data):
                 ]
             }
         ],
-        model="llama-3.2-90b-vision-preview",
         temperature=0.0,
         max_tokens=100
     )
 
-    response = chat_completion.choices[0].message.content.lower()
-    return "yes" in response.split()[0]
+# Local pre-filter and/or the model, as configured by DETECT_BACKENDS
+detect_backends = build_detect_backends(ask_model, lambda: model_router.version("detect"))
 
+async def is_plastic_garbage(image_data):
+    return await detect_backends.predict(ImageInput.coerce(image_data))
@@ -0,0 +1,83 @@
+import pytest
+
+from modules.aadhar_processor import AadharCardProcessor, Candidate, verhoeff_valid
+
+VALID = "234123412346"
+OTHER_VALID = "987654321096"
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return AadharCardProcessor()
+
+
+def symbols(text, confidence=90.0):
+    return [(character, confidence) for character in text]
+
+
+def candidate(number, confidence):
+    return Candidate(number, (confidence,) * 12)
+
+
+def test_verhoeff_accepts_valid_numbers():
+    assert verhoeff_valid(VALID)
+    assert verhoeff_valid(OTHER_VALID)
+
+
+def test_verhoeff_catches_every_single_digit_error():
+    for position in range(12):
+        for digit in "0123456789":
+            if digit != VALID[position]:
+                assert not verhoeff_valid(VALID[:position] + digit + VALID[position + 1:])
+
+
+def test_verhoeff_catches_adjacent_transpositions():
+    for position in range(11):
+        swapped = VALID[:position] + VALID[position + 1] + VALID[position] + VALID[position + 2:]
+        if swapped != VALID:
+            assert not verhoeff_valid(swapped)
+
+
+def test_candidates_from_grouped_number(processor):
+    read = symbols("No: ") + symbols("2341 2341 2346", 80.0)
+    assert processor._candidates(read) == [Candidate(VALID, (80.0,) * 12)]
+
+
+def test_candidates_without_grouping_need_exactly_twelve_digits(processor):
+    assert processor._candidates(symbols("23412341 2346")) == [Candidate(VALID, (90.0,) * 12)]
+    assert processor._candidates(symbols("2341234123")) == []
+
+
+def test_candidates_finds_every_number(processor):
+    read = symbols(f"{VALID} {OTHER_VALID}")
+    assert [found.number for found in processor._candidates(read)] == [VALID, OTHER_VALID]
+
+
+def test_vote_accepts_one_clear_read(processor):
+    assert processor._vote([candidate(VALID, 85.0)]) == VALID
+
+
+def test_vote_needs_support_for_weak_reads(processor):
+    weak = processor.MIN_VOTE_SUPPORT * 0.6
+    assert processor._vote([candidate(VALID, weak)]) is None
+    assert processor._vote([candidate(VALID, weak), candidate(VALID, weak)]) == VALID
+
+
+def test_vote_prefers_the_better_supported_number(processor):
+    reads = [candidate(VALID, 70.0), candidate(OTHER_VALID, 40.0), candidate(OTHER_VALID, 40.0)]
+    assert processor._vote(reads) == OTHER_VALID
+
+
+def test_vote_ignores_checksum_failures(processor):
+    assert processor._vote([candidate("234123412347", 99.0)]) is None
+
+
+def test_vote_fuses_reads_that_each_misread_a_digit(processor):
+    reads = [
+        candidate("834123412346", 70.0),
+        candidate("284123412346", 70.0),
+        candidate("238123412346", 70.0),
+    ]
+    assert processor._vote(reads) == VALID
+    # Too few reads to fuse
+    assert processor._vote(reads[:2]) is None
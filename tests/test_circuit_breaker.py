@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from modules.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def breaker(cooldown=60.0):
+    return CircuitBreaker("test", window=60.0, min_calls=4, error_rate=0.5, cooldown=cooldown)
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.check()
+        breaker.record(False)
+
+
+def test_stays_closed_until_enough_calls_were_seen():
+    circuit = breaker()
+    fail(circuit, 3)
+    assert circuit.state == CLOSED
+    circuit.check()
+
+
+def test_opens_at_the_error_rate_and_fails_fast():
+    circuit = breaker()
+    circuit.check()
+    circuit.record(True)
+    circuit.check()
+    circuit.record(True)
+    fail(circuit, 1)
+    assert circuit.state == CLOSED
+    fail(circuit, 1)
+    assert circuit.state == OPEN
+    assert circuit.rejecting()
+    with pytest.raises(CircuitOpenError) as raised:
+        circuit.check()
+    assert 0 < raised.value.retry_after <= 60.0
+
+
+def test_successes_keep_it_closed():
+    circuit = breaker()
+    for _ in range(20):
+        circuit.check()
+        circuit.record(True)
+    fail(circuit, 3)
+    assert circuit.state == CLOSED
+
+
+def test_lets_one_probe_through_after_the_cooldown():
+    circuit = breaker(cooldown=0.05)
+    fail(circuit, 4)
+    time.sleep(0.06)
+    assert not circuit.rejecting()
+    circuit.check()
+    assert circuit.state == HALF_OPEN
+    assert circuit.rejecting()
+    with pytest.raises(CircuitOpenError):
+        circuit.check()
+
+
+def test_successful_probe_closes_it():
+    circuit = breaker(cooldown=0.05)
+    fail(circuit, 4)
+    time.sleep(0.06)
+    circuit.check()
+    circuit.record(True)
+    assert circuit.state == CLOSED
+    circuit.check()
+
+
+def test_failed_probe_reopens_it():
+    circuit = breaker(cooldown=0.05)
+    fail(circuit, 4)
+    time.sleep(0.06)
+    circuit.check()
+    circuit.record(False)
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit.check()
+
+
+def test_released_probe_can_be_retried():
+    circuit = breaker(cooldown=0.05)
+    fail(circuit, 4)
+    time.sleep(0.06)
+    circuit.check()
+    circuit.release()
+    assert circuit.state == HALF_OPEN
+    circuit.check()
+
+
+def test_late_outcomes_do_not_affect_an_open_breaker():
+    circuit = breaker()
+    fail(circuit, 4)
+    circuit.record(True)
+    assert circuit.state == OPEN
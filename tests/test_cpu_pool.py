@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from modules.cpu_pool import CPUPool, PoolTaskError
+from modules.metrics import observe_stage, render_metrics
+
+
+class UnpicklableError(Exception):
+    """Pickles its message but its __init__ wants two arguments, like TesseractNotFoundError."""
+
+    def __init__(self, path, reason):
+        super().__init__(f"{path}: {reason}")
+
+
+def _raise_unpicklable():
+    raise UnpicklableError("/usr/bin/tesseract", "not found")
+
+
+def _raise_value_error():
+    raise ValueError("Invalid image data")
+
+
+def _add(a, b):
+    return a + b
+
+
+def _timed_stage(stage):
+    with observe_stage(stage):
+        return stage
+
+
+@pytest.fixture
+def pool():
+    pool = CPUPool(size=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_unpicklable_exception_keeps_the_pool_alive(pool):
+    async def scenario():
+        with pytest.raises(PoolTaskError) as raised:
+            await pool.run(_raise_unpicklable)
+        assert raised.value.type_name == "UnpicklableError"
+        assert "not found" in str(raised.value)
+        executor = pool._executor
+        assert await pool.run(_add, 1, 2) == 3
+        assert pool._executor is executor
+
+    asyncio.run(scenario())
+
+
+def test_picklable_exception_is_raised_as_is(pool):
+    async def scenario():
+        with pytest.raises(ValueError, match="Invalid image data"):
+            await pool.run(_raise_value_error)
+
+    asyncio.run(scenario())
+
+
+def _count(n, events):
+    for i in range(n):
+        events.put(("tick", {"i": i}))
+    return n
+
+
+def test_concurrent_streams_get_their_own_events():
+    pool = CPUPool(size=2)
+
+    async def collect(n):
+        return [event async for event in pool.stream(_count, n)]
+
+    async def scenario():
+        return await asyncio.gather(collect(3), collect(5))
+
+    try:
+        three, five = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert three == [("tick", {"i": i}) for i in range(3)] + [("result", 3)]
+    assert five == [("tick", {"i": i}) for i in range(5)] + [("result", 5)]
+
+
+def test_stage_timings_from_pool_processes_reach_metrics(pool):
+    assert asyncio.run(pool.run(_timed_stage, "pool_test")) == "pool_test"
+    body, _ = render_metrics()
+    assert b'check_octo_stage_seconds_count{stage="pool_test"} 1.0' in body
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import modules.model_router as model_router_module
+from modules.aadhar_processor import AadharCardProcessor
+from modules.barcode_scanner import BarcodeScanner
+from modules.document_scanner import DocumentScanner
+from modules.model_router import ModelRouter
+
+VALID_AADHAR = "234123412346"
+
+
+@pytest.fixture(scope="module")
+def scanner():
+    # The detector is only needed for the local stages, not to parse answers
+    return DocumentScanner(AadharCardProcessor(), BarcodeScanner(), None)
+
+
+def test_tasks_come_back_deduplicated_in_canonical_order(scanner):
+    assert scanner.parse_tasks("detect, aadhar,detect") == ("aadhar", "detect")
+    assert scanner.parse_tasks("barcode") == ("barcode",)
+
+
+@pytest.mark.parametrize("tasks", ["", " , ", "aadhar,ocr"])
+def test_unknown_or_missing_tasks_are_rejected(scanner, tasks):
+    with pytest.raises(ValueError):
+        scanner.parse_tasks(tasks)
+
+
+def test_confident_valid_answers_are_accepted(scanner):
+    parse = scanner._parse_model_answer(("aadhar", "barcode", "detect"))
+    results, confidence = parse(
+        'Sure: {"aadhar": {"value": "2341 2341 2346", "confidence": 97},'
+        ' "barcode": {"value": "4006381333931", "confidence": 95},'
+        ' "detect": {"value": "yes", "confidence": 88}}'
+    )
+    assert confidence == 100.0
+    assert results["aadhar"] == {"aadhar_number": VALID_AADHAR}
+    assert results["barcode"]["barcode_value"] == "4006381333931"
+    assert results["detect"] == {"plastic_garbage": "YES"}
+
+
+def test_low_confidence_escalates(scanner):
+    parse = scanner._parse_model_answer(("detect",))
+    results, confidence = parse('{"detect": {"value": "NO", "confidence": 40}}')
+    assert results == {"detect": {"plastic_garbage": "NO"}}
+    assert confidence is None
+
+
+def test_invalid_aadhar_number_escalates(scanner):
+    parse = scanner._parse_model_answer(("aadhar",))
+    results, confidence = parse('{"aadhar": {"value": "234123412347", "confidence": 99}}')
+    assert results == {"aadhar": {"aadhar_number": "Invalid Aadhar number detected"}}
+    assert confidence is None
+
+
+def test_bare_values_without_confidence_escalate(scanner):
+    parse = scanner._parse_model_answer(("barcode", "detect"))
+    results, confidence = parse('{"barcode": "ABC-1234", "detect": "NO"}')
+    assert results["barcode"]["barcode_value"] == "ABC-1234"
+    assert results["detect"] == {"plastic_garbage": "NO"}
+    assert confidence is None
+
+
+@pytest.mark.parametrize("text", ["", "no JSON here", "{not json}", "[1, 2]"])
+def test_unparseable_answers_escalate(scanner, text):
+    results, confidence = scanner._parse_model_answer(("aadhar", "detect"))(text)
+    assert confidence is None
+    assert results["detect"] == {"plastic_garbage": "NO"}
+
+
+@pytest.mark.parametrize("value, valid", [("YES", True), (" no ", True), ("maybe", False), (None, False)])
+def test_detect_validation(scanner, value, valid):
+    assert scanner._validate("detect", value)[1] is valid
+
+
+def test_short_barcode_is_invalid(scanner):
+    response, valid = scanner._validate("barcode", "12")
+    assert not valid
+    assert response["barcode_value"] == "No valid barcode detected"
+
+
+class FakeCompletions:
+    """Stands in for the model API, answering each call with the next canned text."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.models = []
+
+    async def __call__(self, task, model, **kwargs):
+        self.models.append(model)
+        message = SimpleNamespace(content=self.answers.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_confident_scan_makes_one_small_model_call(scanner, monkeypatch):
+    fake = FakeCompletions('{"detect": {"value": "NO", "confidence": 95}}')
+    monkeypatch.setattr(model_router_module, "create_chat_completion", fake)
+    router = ModelRouter("small", "large", enabled=True)
+
+    results = asyncio.run(router.complete("scan", scanner._parse_model_answer(("detect",)), messages=[]))
+    assert results == {"detect": {"plastic_garbage": "NO"}}
+    assert fake.models == ["small"]
+
+
+def test_unsure_scan_escalates_once_to_the_large_model(scanner, monkeypatch):
+    fake = FakeCompletions(
+        '{"detect": {"value": "NO", "confidence": 40}}',
+        '{"detect": {"value": "YES", "confidence": 60}}',
+    )
+    monkeypatch.setattr(model_router_module, "create_chat_completion", fake)
+    router = ModelRouter("small", "large", enabled=True)
+
+    # The large model's answer is kept however unsure it is, there is no third call
+    results = asyncio.run(router.complete("scan", scanner._parse_model_answer(("detect",)), messages=[]))
+    assert results == {"detect": {"plastic_garbage": "YES"}}
+    assert fake.models == ["small", "large"]
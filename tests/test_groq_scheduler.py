@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from modules.groq_scheduler import GroqScheduler, QueueTimeoutError, TokenBucket, parse_duration
+
+
+def test_parse_duration():
+    assert parse_duration("12") == 12.0
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("250ms") == pytest.approx(0.25)
+    assert parse_duration("") is None
+    assert parse_duration("soon") is None
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.spend(10 ** 6, 0.0)
+    assert bucket.wait_time(10 ** 6, 0.0) == 0.0
+
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60, period=60.0)
+    bucket._updated = 0.0
+    bucket.spend(60, 0.0)
+    assert bucket.wait_time(1, 0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(10, 4.0) == pytest.approx(6.0)
+    assert bucket.wait_time(10, 10.0) == 0.0
+
+
+def test_request_larger_than_the_bucket_waits_for_a_full_bucket():
+    bucket = TokenBucket(100, period=60.0)
+    bucket._updated = 0.0
+    bucket.spend(100, 0.0)
+    assert bucket.wait_time(1000, 0.0) == pytest.approx(60.0)
+
+
+def test_sync_adopts_the_reported_budget():
+    bucket = TokenBucket(1000)
+    bucket.sync(remaining=500, limit=6000)
+    assert bucket.capacity == 6000
+    assert bucket.level == pytest.approx(500, abs=1)
+    # Without a limit the report can only lower the level
+    bucket.sync(remaining=5000)
+    assert bucket.level < 600
+
+
+def test_exhausted_budget_blocks_until_reset():
+    bucket = TokenBucket(0)
+    bucket.sync(remaining=0, reset=30.0)
+    assert bucket.wait_time(1, bucket._updated) == pytest.approx(30.0)
+
+
+def test_calls_are_admitted_in_priority_order():
+    async def scenario():
+        # 10 requests per second, starting empty
+        scheduler = GroqScheduler("model", requests_per_minute=600)
+        scheduler.requests.level = 0.0
+        admitted = []
+
+        async def call(task):
+            await scheduler.acquire(task, 1)
+            admitted.append(task)
+
+        calls = []
+        for task in ("analyze", "detect", "aadhar", "barcode"):
+            calls.append(asyncio.ensure_future(call(task)))
+            await asyncio.sleep(0)
+        assert not scheduler.try_acquire("detect", 1)
+        await asyncio.gather(*calls)
+        return admitted
+
+    # Same priority keeps arrival order
+    assert asyncio.run(scenario()) == ["aadhar", "barcode", "detect", "analyze"]
+
+
+def test_call_gives_up_after_its_queue_timeout():
+    async def scenario():
+        scheduler = GroqScheduler("model", requests_per_minute=6)
+        scheduler.requests.level = 0.0
+        scheduler.timeouts["detect"] = 0.05
+        with pytest.raises(QueueTimeoutError) as raised:
+            await scheduler.acquire("detect", 1)
+        assert raised.value.retry_after > 0
+
+    asyncio.run(scenario())
+
+
+def test_pause_longer_than_the_timeout_fails_at_once():
+    async def scenario():
+        scheduler = GroqScheduler("model")
+        scheduler.pause(3600)
+        with pytest.raises(QueueTimeoutError):
+            await asyncio.wait_for(scheduler.acquire("detect", 1), timeout=1)
+
+    asyncio.run(scenario())
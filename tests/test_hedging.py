@@ -0,0 +1,115 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from modules import groq_client
+from modules.groq_scheduler import GroqScheduler
+from modules.hedging import LatencyTracker
+
+
+def tracker(samples=(), **kwargs):
+    options = dict(tasks={"detect"}, quantile=0.9, min_samples=5, min_delay=0.05)
+    options.update(kwargs)
+    latencies = LatencyTracker(**options)
+    for seconds in samples:
+        latencies.observe("detect", seconds)
+    return latencies
+
+
+def test_no_hedge_without_enough_samples():
+    assert tracker([1.0] * 4).hedge_delay("detect") is None
+
+
+def test_no_hedge_for_other_tasks():
+    assert tracker([1.0] * 10).hedge_delay("analyze") is None
+
+
+def test_hedge_delay_is_the_latency_quantile():
+    latencies = tracker([0.1 * i for i in range(1, 11)])
+    assert latencies.hedge_delay("detect") == pytest.approx(0.9)
+
+
+def test_hedge_delay_has_a_floor():
+    assert tracker([0.001] * 10).hedge_delay("detect") == 0.05
+
+
+def test_no_hedge_past_the_timeout():
+    assert tracker([100.0] * 10).hedge_delay("detect") is None
+
+
+class FakeCompletions:
+    """create() for the Groq client; call ``i`` takes ``durations[i]`` seconds"""
+
+    def __init__(self, durations):
+        self.durations = durations
+        self.calls = 0
+        self.cancelled = []
+
+    async def create(self, timeout=None, **kwargs):
+        index = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.durations[index])
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        return f"response {index}"
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    def install(durations, samples=(0.05,) * 5):
+        fake = FakeCompletions(durations)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=fake)))
+        monkeypatch.setattr(groq_client, "get_groq_client", lambda: client)
+        monkeypatch.setattr(groq_client, "latency_tracker", tracker(samples))
+        return fake
+    return install
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled(completions):
+    fake = completions([1.0, 0.01])
+
+    async def scenario():
+        return await groq_client._send("detect", GroqScheduler("model"), 100, {})
+
+    assert asyncio.run(scenario()) == "response 1"
+    assert fake.calls == 2
+    assert fake.cancelled == [0]
+
+
+def test_fast_call_is_not_hedged(completions):
+    fake = completions([0.01, 0.01])
+
+    async def scenario():
+        return await groq_client._send("detect", GroqScheduler("model"), 100, {})
+
+    assert asyncio.run(scenario()) == "response 0"
+    assert fake.calls == 1
+
+
+def test_no_hedge_without_budget(completions):
+    fake = completions([0.2, 0.01])
+
+    async def scenario():
+        scheduler = GroqScheduler("model", requests_per_minute=60)
+        scheduler.requests.level = 0.0
+        return await groq_client._send("detect", scheduler, 100, {})
+
+    assert asyncio.run(scenario()) == "response 0"
+    assert fake.calls == 1
+
+
+def test_cancelling_the_call_cancels_every_copy(completions):
+    fake = completions([1.0, 1.0])
+
+    async def scenario():
+        call = asyncio.ensure_future(groq_client._send("detect", GroqScheduler("model"), 100, {}))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(scenario())
+    assert sorted(fake.cancelled) == [0, 1]
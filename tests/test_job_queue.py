@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+import time
+
+from modules import job_queue
+from modules.circuit_breaker import CircuitOpenError
+from modules.groq_client import retry_after
+from modules.job_queue import JobStore, JobWorkerPool
+
+
+def test_queued_job_runs_to_completion(tmp_path):
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"))
+
+    async def handler(video_url):
+        return {"video_url": video_url, "plastic_garbage": "NO"}
+
+    async def scenario():
+        pool = JobWorkerPool(store, handler, size=1)
+        pool.start()
+        job_id = store.submit("http://example.com/video.mp4")
+        pool.notify()
+        for _ in range(100):
+            job = store.get(job_id)
+            if job["status"] == "done":
+                break
+            await asyncio.sleep(0.05)
+        await pool.stop()
+        return store.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "done"
+    assert job["result"]["plastic_garbage"] == "NO"
+
+
+def test_idle_workers_back_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(job_queue, "MAX_POLL_INTERVAL", 0.08)
+    claims = []
+
+    class CountingStore(JobStore):
+        def claim(self, owner):
+            claims.append(owner)
+            return super().claim(owner)
+
+    async def scenario():
+        pool = JobWorkerPool(CountingStore(path=str(tmp_path / "jobs.sqlite3")), None, size=1)
+        pool.start()
+        await asyncio.sleep(0.6)
+        await pool.stop()
+
+    asyncio.run(scenario())
+    # Polling every 10 ms throughout would have made about 60 claims
+    assert 3 < len(claims) < 20
+
+
+def test_requeued_job_waits_until_due(tmp_path):
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("http://example.com/video.mp4")
+    assert store.claim("worker")["id"] == job_id
+    store.requeue(job_id, "Model API unavailable", delay=0.2)
+    assert store.claim("worker") is None
+    time.sleep(0.25)
+    assert store.claim("worker")["id"] == job_id
+
+
+def test_transient_failure_is_retried_after_retry_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(job_queue, "MAX_POLL_INTERVAL", 0.02)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BACKOFF", 0.01)
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"))
+    attempts = []
+
+    async def handler(video_url):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise CircuitOpenError("model", 0.3)
+        return {"plastic_garbage": "NO"}
+
+    async def scenario():
+        pool = JobWorkerPool(store, handler, size=1, retry_on=(CircuitOpenError,), retry_after=retry_after)
+        pool.start()
+        job_id = store.submit("http://example.com/video.mp4")
+        pool.notify()
+        for _ in range(100):
+            if store.get(job_id)["status"] != "queued" and len(attempts) > 1:
+                break
+            await asyncio.sleep(0.02)
+        await pool.stop()
+        return store.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "done"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.3
+
+
+def test_retry_delay_backs_off_exponentially(tmp_path):
+    pool = JobWorkerPool(JobStore(path=str(tmp_path / "jobs.sqlite3")), None, retry_after=lambda error: None)
+    assert pool._retry_delay(RuntimeError(), 0) == job_queue.JOB_RETRY_BACKOFF
+    assert pool._retry_delay(RuntimeError(), 2) == job_queue.JOB_RETRY_BACKOFF * 4
+
+
+def test_job_table_from_before_delayed_retries_is_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    old = sqlite3.connect(path)
+    old.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, video_url TEXT NOT NULL, callback_url TEXT, status TEXT NOT NULL, "
+        "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, lease_until REAL, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    old.commit()
+    old.close()
+    store = JobStore(path=path)
+    job_id = store.submit("http://example.com/video.mp4")
+    store.requeue(job_id, "error", delay=60)
+    assert store.claim("worker") is None
@@ -0,0 +1,41 @@
+import numpy as np
+
+from video import THUMBNAIL_SIZE, select_keyframes
+
+WIDTH, HEIGHT = THUMBNAIL_SIZE
+
+
+def frame(value):
+    return np.full((HEIGHT, WIDTH), value, dtype=np.uint8)
+
+
+def test_short_clip_keeps_every_frame():
+    assert select_keyframes([frame(0), frame(50)], 4) == [0, 1]
+
+
+def test_static_clip_is_spread_evenly():
+    assert select_keyframes([frame(10)] * 10, 4) == [0, 3, 6, 9]
+
+
+def test_picks_are_sorted_unique_and_complete():
+    rng = np.random.default_rng(0)
+    thumbnails = [rng.integers(0, 255, (HEIGHT, WIDTH), dtype=np.uint8) for _ in range(30)]
+    picks = select_keyframes(thumbnails, 4)
+    assert picks == sorted(set(picks))
+    assert len(picks) == 4
+
+
+def test_scene_cut_is_picked():
+    thumbnails = [frame(0)] * 12 + [frame(200)] * 12
+    picks = select_keyframes(thumbnails, 4)
+    assert 12 in picks
+    # One cut holds all the change, the rest are spread over the clip
+    assert len(picks) == 4
+    assert picks[0] < 6 and picks[-1] > 18
+
+
+def test_busy_stretch_gets_more_keyframes():
+    still = [frame(0)] * 20
+    busy = [frame(value) for value in range(0, 200, 10)]
+    picks = select_keyframes(still + busy, 4)
+    assert sum(pick >= 20 for pick in picks) >= 3
@@ -0,0 +1,21 @@
+from modules.result_cache import ResultCache
+
+
+def test_round_trip_and_stats(tmp_path):
+    cache = ResultCache(path=str(tmp_path / "results.sqlite3"))
+    key = cache.make_key("detect", b"image", "v1")
+    assert cache.get("detect", key) is None
+    cache.set("detect", key, {"plastic_garbage": "YES"})
+    assert cache.get("detect", key) == {"plastic_garbage": "YES"}
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["endpoints"] == {"detect": {"hits": 1, "misses": 1}}
+
+
+def test_database_errors_are_reported_not_raised(tmp_path):
+    # A directory cannot be opened as a database
+    cache = ResultCache(path=str(tmp_path))
+    assert cache.get("detect", "key") is None
+    cache.set("detect", "key", {})
+    assert "error" in cache.stats()
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+
+# Without the context manager the lifespan (CPU pool, model API warm-up) never runs
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/detect", "/aadhar", "/barcode", "/scan"])
+def test_invalid_json_is_rejected_with_422(path):
+    response = client.post(path, content=b'{"image": "abc', headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("path", ["/detect/batch", "/aadhar/batch", "/barcode/batch"])
+def test_invalid_batch_json_is_rejected_with_422(path):
+    response = client.post(path, content=b'[{"image": 1}', headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+
+
+def test_validation_error_does_not_echo_the_payload():
+    payload = b'{"image": "' + b'A' * 100000 + b'"'
+    response = client.post("/detect", content=payload, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert len(response.content) < 1000
+
+
+def test_analysis_stream_is_refused_when_all_slots_are_taken(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "stream_slots", app_module.asyncio.Semaphore(0))
+    response = client.get("/analyze/stream", params={"video_url": "http://example.com/clip.mp4"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(app_module.ANALYZE_STREAM_RETRY_AFTER)
+
+
+def test_analysis_stream_frees_its_slot_when_done(monkeypatch):
+    import app as app_module
+
+    async def events(video_url):
+        yield app_module._sse("done", {"video_url": video_url})
+
+    monkeypatch.setattr(app_module, "stream_slots", app_module.asyncio.Semaphore(1))
+    monkeypatch.setattr(app_module, "_analysis_events", events)
+    for _ in range(2):
+        response = client.get("/analyze/stream", params={"video_url": "http://example.com/clip.mp4"})
+        assert response.status_code == 200
+        assert "event: done" in response.text
@@ -0,0 +1,27 @@
+import pytest
+
+from video import parse_verdict
+
+
+@pytest.mark.parametrize("text, verdict", [
+    ("The person drops the bag into the bin. YES, 90%", "YES"),
+    ("Conclusion: Yes, 80%", "YES"),
+    ("**Conclusion**: no (confidence 70%)", "NO"),
+    ("There is no bin in view. Conclusion - NO.", "NO"),
+    ("There is no bin in view, so the answer is yes", "YES"),
+    ("The frames are too dark to tell.", None),
+])
+def test_final_verdict(text, verdict):
+    assert parse_verdict(text, final=True) == verdict
+
+
+def test_streamed_verdict_waits_for_the_word_to_end():
+    assert parse_verdict("Conclusion: Ye") is None
+    assert parse_verdict("Conclusion: Yes") is None
+    assert parse_verdict("Conclusion: Yes,") == "YES"
+    assert parse_verdict("Answer: NO") is None
+    assert parse_verdict("Answer: NO ") == "NO"
+
+
+def test_prose_no_is_not_a_streamed_verdict():
+    assert parse_verdict("There is no bin in view, ") is None
@@ -1,30 +1,84 @@
 import os
+import time
+import asyncio
+import logging
 import base64
 import cv2
 import numpy as np
-from groq import Groq
-from urllib.request import urlopen
+from modules.groq_client import create_chat_completion, stream_chat_completion
+from modules.model_router import parse_confidence
+from modules.metrics import OUTBOUND_CONNECTIONS, OUTBOUND_REQUESTS, STAGE_SECONDS, VIDEO_CACHE_LOOKUPS, observe_stage
+from modules.cpu_pool import video_pool
+from modules.video_cache import video_cache
+from modules.http_client import HTTP_CHUNK_SIZE, HTTP_TIMEOUT, get_http_session
+from modules.result_cache import prompt_version
 import tempfile
-import requests
-from PIL import Image
-import io
 import re
+from contextlib import contextmanager
+from collections import namedtuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "stream" decodes frames straight from the URL, "download" fetches a temp file first
+VIDEO_INGEST_MODE = os.getenv("VIDEO_INGEST_MODE", "stream")
+STREAM_TIMEOUT_MS = int(os.getenv("VIDEO_STREAM_TIMEOUT_MS", "15000"))
+
+# Layout of the composite sent to the model, one keyframe per tile
+GRID_ROWS = int(os.getenv("VIDEO_GRID_ROWS", "2"))
+GRID_COLS = int(os.getenv("VIDEO_GRID_COLS", "2"))
+TILE_SIZE = (int(os.getenv("VIDEO_TILE_WIDTH", "300")), int(os.getenv("VIDEO_TILE_HEIGHT", "300")))
+GRID_TIMESTAMPS = os.getenv("VIDEO_GRID_TIMESTAMPS", "1") == "1"
+GRID_JPEG_QUALITY = int(os.getenv("VIDEO_GRID_JPEG_QUALITY", "85"))
+
+ANALYSIS_PROMPT = (
+    "These are {count} sequential frames from a video, left to right and top to bottom{labels}. "
+    "Does it show someone properly disposing garbage in a bin? "
+    "Describe what you see and provide a YES/NO conclusion with confidence percentage."
+)
+ANALYSIS_MODEL = "llama-3.2-11b-vision-preview"
+# The conclusion as the prompt asks for it; lowercase "no" is ordinary prose
+VERDICT_PATTERN = re.compile(r'\b(YES|NO)\b')
+# Models also write "Conclusion: Yes" or "**Conclusion**: no"
+CONCLUSION_PATTERN = re.compile(r'\bconclusion\b\W*(yes|no)\b', re.IGNORECASE)
+ANY_CASE_VERDICT_PATTERN = re.compile(r'\b(yes|no)\b', re.IGNORECASE)
+
+# Least time between download progress events of a streamed analysis
+PROGRESS_INTERVAL = float(os.getenv("VIDEO_PROGRESS_INTERVAL", "0.25"))
+
+# Keyframe sampling: how much of the clip is scanned and how densely
+MAX_SCAN_SECONDS = float(os.getenv("VIDEO_MAX_SCAN_SECONDS", "30"))
+SCAN_FPS = float(os.getenv("VIDEO_SCAN_FPS", "2"))
+KEYFRAME_COUNT = GRID_ROWS * GRID_COLS
+# Sampled frames are kept at this size until the keyframes are chosen
+FRAME_MAX_SIDE = int(os.getenv("VIDEO_FRAME_MAX_SIDE", "480"))
+THUMBNAIL_SIZE = (64, 36)
+
+# Cached keyframes and composites are only reused when built with the same settings
+FRAMES_VERSION = prompt_version("scene-change-1", str(MAX_SCAN_SECONDS), str(SCAN_FPS), str(FRAME_MAX_SIDE), str(KEYFRAME_COUNT))
+COMPOSITE_VERSION = prompt_version(
+    FRAMES_VERSION, str(GRID_ROWS), str(GRID_COLS), str(TILE_SIZE), str(GRID_TIMESTAMPS), str(GRID_JPEG_QUALITY)
+)
+
+# A sampled BGR frame and its position in the clip in seconds
+Keyframe = namedtuple('Keyframe', ['timestamp', 'image'])
+
+def _reporter(events):
+    """``report(event, **data)`` putting progress on ``events``, a no-op without a queue."""
+    if events is None:
+        return lambda event, **data: None
+    return lambda event, **data: events.put((event, data))
 
 def is_cloudinary_url(url):
     """Check if the URL is a Cloudinary URL."""
     return 'cloudinary.com' in url or 'res.cloudinary.com' in url
 
-def get_video_format(url):
-    """Determine video format from URL or headers."""
-    # First try to get format from content-type header
-    try:
-        response = requests.head(url)
-        content_type = response.headers.get('content-type', '')
-        if 'video' in content_type:
-            # Extract format from content-type (e.g., 'video/mp4' -> 'mp4')
-            return content_type.split('/')[-1]
-    except:
-        pass
+def get_video_format(url, content_type=''):
+    """Determine video format from the response content type or the URL."""
+    if 'video' in content_type:
+        # Extract format from content-type (e.g., 'video/mp4' -> 'mp4')
+        return content_type.split(';')[0].split('/')[-1].strip()
 
     # If that fails, try to get it from the URL
     video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
@@ -35,156 +89,469 @@ def get_video_format(url):
     # Default to mp4 if we can't determine the format
     return 'mp4'
 
-def download_video(url):
-    """Download video from URL (including Cloudinary) to a temporary file."""
+def normalize_video_url(url):
+    """Apply the delivery flag some Cloudinary URLs need."""
+    # For Cloudinary URLs, we might need to handle special cases
+    if is_cloudinary_url(url):
+        # Some Cloudinary URLs might need additional parameters
+        if '?' not in url:
+            url += '?fl_video'
+    return url
+
+def fetch_video(url, headers=None):
+    """Start a streamed GET of the video; the caller reads or closes the response.
+
+    With revalidation ``headers`` a 304 is returned as is, any other error
+    status raises.
+    """
+    response = get_http_session().get(normalize_video_url(url), stream=True, headers=headers, timeout=HTTP_TIMEOUT)
+    if response.status_code != 304:
+        response.raise_for_status()  # Raise exception for bad status codes
+    return response
+
+def probe_video(url, headers=None):
+    """HEAD the video for its validators (ETag, Last-Modified) without fetching the body.
+
+    With revalidation ``headers`` a 304 means the cached entry is current.
+    Returns None when the origin refuses HEAD (e.g. a URL signed for GET
+    only), the video is then analysed without being cached.
+    """
+    response = get_http_session().head(
+        normalize_video_url(url), headers=headers, timeout=HTTP_TIMEOUT, allow_redirects=True
+    )
+    if response.status_code != 304 and not response.ok:
+        logger.info(f"HEAD of the video failed ({response.status_code}), not caching it")
+        return None
+    return response
+
+def download_video(url, response=None, report=_reporter(None)):
+    """Download video from URL (including Cloudinary) to a temporary file.
+
+    An already started ``response`` for the video is read instead of issuing
+    a new request. Progress is reported as "download" events.
+    """
+    temp = None
+    received = 0
+    reported = time.monotonic()
     try:
-        # For Cloudinary URLs, we might need to handle special cases
-        if is_cloudinary_url(url):
-            # Some Cloudinary URLs might need additional parameters
-            if '?' not in url:
-                url += '?fl_video'
+        if response is None:
+            response = fetch_video(url)
         
         # Get video format
-        video_format = get_video_format(url)
+        video_format = get_video_format(url, response.headers.get('content-type', ''))
         
         # Create temporary file with appropriate extension
         temp = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{video_format}')
         
-        # Download the video
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise exception for bad status codes
-        
         # Write the content to temporary file
-        for chunk in response.iter_content(chunk_size=8192):
+        for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
             if chunk:
                 temp.write(chunk)
+                received += len(chunk)
+                if time.monotonic() - reported >= PROGRESS_INTERVAL:
+                    report("download", bytes=received)
+                    reported = time.monotonic()
         
         temp.close()
+        report("downloaded", bytes=received)
         return temp.name
     except Exception as e:
+        # Never leave a partial download behind
+        if temp is not None:
+            temp.close()
+            os.unlink(temp.name)
         raise Exception(f"Failed to download video: {str(e)}")
 
-def extract_frames(video_path, max_duration=4):
-    """Extract one frame per second from the video."""
-    frames = []
-    cap = cv2.VideoCapture(video_path)
+@contextmanager
+def downloaded_video(url, response=None, report=_reporter(None)):
+    """Download the video to a temporary file that is removed on exit."""
+    with observe_stage("video_download"):
+        video_path = download_video(url, response, report)
+    try:
+        yield video_path
+    finally:
+        os.unlink(video_path)
+
+def open_video_stream(url):
+    """Open a remote video for progressive decoding over HTTP.
+
+    FFmpeg pulls bytes only as frames are decoded and issues range requests
+    when the container index sits at the end of the file (non-faststart MP4),
+    so releasing the capture early stops the transfer.
+    """
+    if not cv2.videoio_registry.hasBackend(cv2.CAP_FFMPEG):
+        raise Exception("OpenCV was built without FFmpeg, cannot stream video")
     
+    params = [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+    ]
+    url = normalize_video_url(url)
+    # FFmpeg cannot use the pooled session; count its fetch so the reuse ratio stays honest
+    OUTBOUND_REQUESTS.labels("ffmpeg", "GET").inc()
+    OUTBOUND_CONNECTIONS.labels("ffmpeg", url.split(":", 1)[0].lower()).inc()
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
     if not cap.isOpened():
-        raise Exception("Failed to open video file")
-    
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    if fps == 0:
-        fps = 25  # Default to 25 fps if we can't detect it
-    
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps
-    actual_duration = min(duration, max_duration)
-    
-    for sec in range(int(actual_duration)):
-        frame_position = sec * fps
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
-        ret, frame = cap.read()
-        if ret:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame_rgb)
-        else:
-            break
+        cap.release()
+        raise Exception("Failed to open video stream")
+    return cap
+
+def _thumbnail(frame):
+    """Small grayscale copy used only to measure change between frames."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+def _downscale(frame, max_side):
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+def select_keyframes(thumbnails, count):
+    """Pick the indices of ``count`` informative frames, in order.
+
+    Each frame is scored by its mean absolute difference to the previous
+    sample. The clip is cut into ``count`` spans carrying equal shares of the
+    total change and the most changed frame of each span is kept, so busy
+    stretches get more keyframes while the whole clip stays covered.
+    """
+    total = len(thumbnails)
+    if total <= count:
+        return list(range(total))
+
+    stack = np.stack(thumbnails).astype(np.float32)
+    scores = np.zeros(total, dtype=np.float32)
+    scores[1:] = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+
+    cumulative = np.cumsum(scores)
+    if cumulative[-1] <= 0:
+        # Static clip, spread the picks evenly
+        return np.linspace(0, total - 1, count).round().astype(int).tolist()
+
+    bounds = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, count) / count, side='right')
+    spans = [span for span in np.split(np.arange(total), np.unique(bounds)) if len(span)]
+    picks = {int(span[np.argmax(scores[span])]) for span in spans}
+
+    # A single large cut can swallow several spans, top up with the frames
+    # furthest in time from those already picked
+    positions = np.arange(total)
+    while len(picks) < count:
+        distance = np.min(np.abs(positions[:, None] - np.array(sorted(picks))[None, :]), axis=1)
+        picks.add(int(np.argmax(distance)))
+    return sorted(picks)
+
+def extract_frames(source, count=KEYFRAME_COUNT, max_duration=MAX_SCAN_SECONDS):
+    """Extract ``count`` keyframes from the video in a single sequential pass.
+
+    ``source`` is a file path or an opened ``cv2.VideoCapture``. Up to
+    ``max_duration`` seconds are scanned at SCAN_FPS. Frames in between are
+    only grabbed, not converted, and every sampled frame is kept downscaled
+    alongside a tiny thumbnail used for scene-change scoring. Returns
+    ``Keyframe`` tuples in clip order, still in BGR.
+    """
+    cap = source if isinstance(source, cv2.VideoCapture) else cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            raise Exception("Failed to open video file")
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or fps <= 0:
+            fps = 25  # Default to 25 fps if we can't detect it
+        stride = max(1, round(fps / SCAN_FPS))
+        last_position = int(max_duration * fps)
+        
+        samples = []
+        thumbnails = []
+        for position in range(last_position):
+            # grab() advances without converting frames we do not sample
+            if position % stride:
+                if not cap.grab():
+                    break
+                continue
+            
+            ret, frame = cap.read()
+            if not ret:
+                break
+            thumbnails.append(_thumbnail(frame))
+            samples.append(Keyframe(position / fps, _downscale(frame, FRAME_MAX_SIDE)))
+        
+        keyframes = select_keyframes(thumbnails, count)
+        logger.info(f"Selected keyframes {keyframes} from {len(samples)} samples")
+        return [samples[index] for index in keyframes]
+    finally:
+        cap.release()
+
+def read_video_frames(video_url, response=None, report=_reporter(None)):
+    """Extract frames, streaming from the URL when possible.
+
+    ``response`` is an open GET of the video, reused by the download path.
+    """
+    if VIDEO_INGEST_MODE == "stream":
+        report("streaming")
+        if response is not None:
+            # FFmpeg fetches the video itself, don't leave the body half read
+            response.close()
+            response = None
+        try:
+            with observe_stage("video_open"):
+                cap = open_video_stream(video_url)
+            with observe_stage("frame_extraction"):
+                frames = extract_frames(cap)
+            if frames:
+                return frames
+            logger.info("Streaming produced no frames, falling back to download...")
+        except Exception as e:
+            logger.info(f"Streaming failed ({str(e)}), falling back to download...")
     
-    cap.release()
-    return frames
+    with downloaded_video(video_url, response, report) as video_path:
+        with observe_stage("frame_extraction"):
+            return extract_frames(video_path)
+
+def _draw_timestamp(tile, timestamp):
+    """Label a tile with its position in the clip, outlined to stay legible."""
+    label = f"{timestamp:.1f}s"
+    origin = (8, 8 + 20)
+    cv2.putText(tile, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 4, cv2.LINE_AA)
+    cv2.putText(tile, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 1, cv2.LINE_AA)
+
+def create_grid_image(frames, rows=GRID_ROWS, cols=GRID_COLS, tile_size=TILE_SIZE, timestamps=GRID_TIMESTAMPS):
+    """Compose up to rows x cols keyframes into one BGR image, row by row.
 
-def create_grid_image(frames):
-    """Create a 2x2 grid from up to 4 frames."""
-    frames = frames[:4]
+    Frames are resized straight into a preallocated canvas, keeping their
+    aspect ratio inside each tile, and optionally labelled with their time.
+    """
+    frames = frames[:rows * cols]
     if not frames:
         return None
     
-    # Convert frames to PIL Images
-    pil_frames = [Image.fromarray(frame) for frame in frames]
+    tile_width, tile_height = tile_size
+    canvas = np.zeros((rows * tile_height, cols * tile_width, 3), dtype=np.uint8)
+    
+    for i, keyframe in enumerate(frames):
+        row, col = divmod(i, cols)
+        tile = canvas[row * tile_height:(row + 1) * tile_height, col * tile_width:(col + 1) * tile_width]
+        
+        height, width = keyframe.image.shape[:2]
+        scale = min(tile_width / width, tile_height / height)
+        fit_width, fit_height = max(1, round(width * scale)), max(1, round(height * scale))
+        left, top = (tile_width - fit_width) // 2, (tile_height - fit_height) // 2
+        
+        # Resizing into a view of the canvas avoids an intermediate copy
+        cv2.resize(
+            keyframe.image, (fit_width, fit_height),
+            dst=tile[top:top + fit_height, left:left + fit_width],
+            interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR,
+        )
+        if timestamps:
+            _draw_timestamp(tile, keyframe.timestamp)
     
-    # Resize all frames to the same size
-    size = (300, 300)
-    pil_frames = [img.resize(size) for img in pil_frames]
+    return canvas
+
+def encode_image(image):
+    """Encode a BGR image as JPEG bytes."""
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, GRID_JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Failed to encode grid image")
+    return encoded.tobytes()
+
+def build_composite(frames):
+    """Build and JPEG encode the keyframe composite."""
+    logger.info("Creating grid image...")
+    with observe_stage("grid_build"):
+        grid_image = create_grid_image(frames)
     
-    # Create a new blank image
-    grid_width = size[0] * 2
-    grid_height = size[1] * 2
-    grid_image = Image.new('RGB', (grid_width, grid_height))
+    if grid_image is None:
+        raise ValueError("Failed to create grid image")
     
-    # Paste frames into grid
-    positions = [(0,0), (size[0],0), (0,size[1]), (size[0],size[1])]
-    for i, frame in enumerate(pil_frames):
-        if i < 4:
-            grid_image.paste(frame, positions[i])
+    with observe_stage("jpeg_encode"):
+        return encode_image(grid_image)
+
+def _cached_composite(video_url):
+    """Composite for a revalidated video from the cache, or None if it was evicted."""
+    composite = video_cache.load_composite(video_url, COMPOSITE_VERSION)
+    if composite is not None:
+        VIDEO_CACHE_LOOKUPS.labels("hit").inc()
+        return composite
     
-    return grid_image
+    keyframes = video_cache.load_keyframes(video_url, FRAMES_VERSION)
+    if keyframes is None:
+        return None
+    # Only the layout changed, rebuild from the stored keyframes without decoding
+    VIDEO_CACHE_LOOKUPS.labels("keyframes").inc()
+    composite = build_composite([Keyframe(*keyframe) for keyframe in keyframes])
+    video_cache.store_composite(video_url, COMPOSITE_VERSION, composite)
+    return composite
 
-def encode_image(image):
-    """Convert PIL Image to base64 string."""
-    buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
-    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+def prepare_grid_image(video_url, events=None):
+    """Fetch the video and build the base64 encoded frame grid (blocking).
 
-def analyze_garbage_disposal(video_url):
-    """Analyze video frames for proper garbage disposal."""
+    A video analysed before is revalidated with a conditional request (HEAD
+    when streaming, GET when downloading), and on a 304 the cached composite
+    is used without downloading or decoding.
+    With an ``events`` queue, each completed stage puts an (event, data) pair
+    on it: "cached", "download"/"downloaded" or "streaming", "frames" and
+    "composite".
+    """
+    report = _reporter(events)
+    entry = video_cache.lookup(video_url)
+    # When streaming, FFmpeg fetches the body itself and only the validators
+    # are needed here; a download reads the body of the revalidating GET
+    fetch = probe_video if VIDEO_INGEST_MODE == "stream" else fetch_video
+    response = None
     try:
-        # Initialize Groq client
-        client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-        
-        # Download video
-        print("Downloading video...")
-        video_path = download_video(video_url)
-        
-        # Extract frames
-        print("Extracting frames...")
-        frames = extract_frames(video_path)
-        
-        if not frames:
-            raise ValueError("No frames could be extracted from the video")
-        
-        # Create grid image
-        print("Creating grid image...")
-        grid_image = create_grid_image(frames)
-        
-        if grid_image is None:
-            raise ValueError("Failed to create grid image")
-        
-        # Encode grid image
-        encoded_image = encode_image(grid_image)
-        image_content = f"data:image/jpeg;base64,{encoded_image}"
-        
-        # Create the chat completion
-        print("Analyzing frames...")
-        chat_completion = client.chat.completions.create(
-            messages=[
+        if video_cache.enabled:
+            with observe_stage("video_revalidate" if entry else "video_probe" if fetch is probe_video else "video_open"):
+                response = fetch(video_url, video_cache.conditional_headers(entry))
+            if response is not None and response.status_code == 304:
+                response.close()
+                composite = _cached_composite(video_url)
+                if composite is not None:
+                    logger.info("Video unchanged, using cached composite")
+                    report("cached", bytes=len(composite))
+                    return base64.b64encode(composite).decode('utf-8')
+                response = fetch(video_url)
+            VIDEO_CACHE_LOOKUPS.labels("stale" if entry else "miss").inc()
+    except Exception as e:
+        raise Exception(f"Failed to fetch video: {str(e)}")
+    
+    try:
+        # Fetch and extract frames
+        logger.info("Extracting frames...")
+        body = response if response is not None and response.request.method == "GET" else None
+        frames = read_video_frames(video_url, body, report)
+    finally:
+        if response is not None:
+            response.close()
+    
+    if not frames:
+        raise ValueError("No frames could be extracted from the video")
+    report("frames", count=len(frames), timestamps=[round(frame.timestamp, 2) for frame in frames])
+    
+    composite = build_composite(frames)
+    report("composite", bytes=len(composite))
+    if response is not None:
+        video_cache.store(
+            video_url,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            FRAMES_VERSION,
+            frames,
+            COMPOSITE_VERSION,
+            composite,
+        )
+    return base64.b64encode(composite).decode('utf-8')
+
+def analysis_messages(encoded_image):
+    """Chat messages asking the model to judge the base64 encoded frame grid."""
+    image_content = f"data:image/jpeg;base64,{encoded_image}"
+    return [
+        {
+            "role": "system",
+            "content": "You are an AI assistant that analyzes sequences of images to verify proper garbage disposal. Look for evidence of someone properly disposing of garbage in a bin across the frames."
+        },
+        {
+            "role": "user",
+            "content": [
                 {
-                    "role": "system",
-                    "content": "You are an AI assistant that analyzes sequences of images to verify proper garbage disposal. Look for evidence of someone properly disposing of garbage in a bin across the frames."
+                    "type": "text",
+                    "text": ANALYSIS_PROMPT.format(
+                        count=KEYFRAME_COUNT,
+                        labels=", each labelled with its time in the clip" if GRID_TIMESTAMPS else "",
+                    )
                 },
                 {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "These are 4 sequential frames from a video. Does it show someone properly disposing garbage in a bin? Describe what you see and provide a YES/NO conclusion with confidence percentage."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": image_content}
-                        }
-                    ]
+                    "type": "image_url",
+                    "image_url": {"url": image_content}
                 }
-            ],
-            model="llama-3.2-11b-vision-preview",
-            temperature=0.0,
-            max_tokens=200
-        )
-        
-        # Clean up temporary file
-        os.unlink(video_path)
-        
-        return chat_completion.choices[0].message.content
-        
+            ]
+        }
+    ]
+
+def parse_verdict(text, final=False):
+    """The YES/NO conclusion in the model's text, or None.
+
+    An uppercase YES/NO wins, then one following "Conclusion" in any case.
+    Until ``final`` a match at the very end of the text is not trusted, the
+    next chunk could still extend the word. Once the text is complete, the
+    last yes/no in any case is taken as a last resort.
+    """
+    for pattern in (VERDICT_PATTERN, CONCLUSION_PATTERN):
+        for match in pattern.finditer(text):
+            if final or match.end() < len(text):
+                return match.group(1).upper()
+    if final:
+        answers = ANY_CASE_VERDICT_PATTERN.findall(text)
+        if answers:
+            return answers[-1].upper()
+    return None
+
+async def run_garbage_analysis(video_url):
+    """Analyze video frames for proper garbage disposal, raising on failure.
+
+    Fetching, frame decoding and the grid build run in the video pool, so
+    only the small encoded grid comes back to the worker.
+    """
+    encoded_image = await video_pool.run(prepare_grid_image, video_url)
+    
+    # Create the chat completion
+    logger.info("Analyzing frames...")
+    chat_completion = await create_chat_completion(
+        "analyze",
+        messages=analysis_messages(encoded_image),
+        model=ANALYSIS_MODEL,
+        temperature=0.0,
+        max_tokens=200
+    )
+    
+    return chat_completion.choices[0].message.content
+
+async def stream_garbage_analysis(video_url):
+    """Analyze a video like run_garbage_analysis, yielding (event, data) pairs as it goes.
+
+    The pool's progress events come first, then "analyzing", a "token" per
+    chunk of the model's answer, "verdict" as soon as the YES/NO conclusion
+    has been streamed, and finally "done" with the whole answer.
+    """
+    encoded_image = None
+    async for event, data in video_pool.stream(prepare_grid_image, video_url):
+        if event == "result":
+            encoded_image = data
+        else:
+            yield event, data
+    
+    logger.info("Analyzing frames (streaming)...")
+    yield "analyzing", {"model": ANALYSIS_MODEL}
+    started = time.perf_counter()
+    text = ""
+    verdict = None
+    async for delta in stream_chat_completion(
+        "analyze_stream",
+        messages=analysis_messages(encoded_image),
+        model=ANALYSIS_MODEL,
+        temperature=0.0,
+        max_tokens=200
+    ):
+        if not text:
+            STAGE_SECONDS.labels("analysis_first_token").observe(time.perf_counter() - started)
+        text += delta
+        yield "token", {"text": delta}
+        if verdict is None:
+            verdict = parse_verdict(text)
+            if verdict is not None:
+                yield "verdict", {"verdict": verdict}
+    
+    if verdict is None:
+        verdict = parse_verdict(text, final=True)
+        if verdict is not None:
+            yield "verdict", {"verdict": verdict}
+    _, confidence = parse_confidence(text)
+    yield "done", {"result": text, "verdict": verdict, "confidence": confidence}
+
+async def analyze_garbage_disposal(video_url):
+    """Analyze video frames for proper garbage disposal."""
+    try:
+        return await run_garbage_analysis(video_url)
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -192,6 +559,6 @@ if __name__ == "__main__":
     # Example Cloudinary URL
     video_url = "YOUR_CLOUDINARY_VIDEO_URL"
     
-    result = analyze_garbage_disposal(video_url)
+    result = asyncio.run(analyze_garbage_disposal(video_url))
     print("\nAnalysis Result:")
     print(result)
\ No newline at end of file